@@ -2,26 +2,24 @@
 """
     Encrypt password module.
 """
-import bcrypt
+from password_hasher import get_hasher
 
 
 def hash_password(password: str) -> bytes:
     """
     Hash a password with bcrypt, adding a salt for additional security.
 
+    The hash runs on the bounded bcrypt worker pool, which raises
+    HasherBusyError when too many hashes are already pending.
+
     Args:
         password (str): The password to be hashed
 
     Returns:
         bytes: The salted, hashed password.
     """
-    # Generate a salt
-    salt = bcrypt.gensalt()
-
-    # Hash the password with the generated salt
-    hashed_password = bcrypt.hashpw(password.encode('utf-8'), salt)
-
-    return hashed_password
+    # Hash the password with a new salt on the worker pool
+    return get_hasher().hash(password).result()
 
 
 def is_valid(hashed_password: bytes, password: str) -> bool:
@@ -31,5 +29,5 @@ def is_valid(hashed_password: bytes, password: str) -> bool:
     Returns:
         bool: True if the password matches, False otherwise.
     """
-    # Check if the password matches the hashed password
-    return bcrypt.checkpw(password.encode('utf-8'), hashed_password)
+    # Check if the password matches the hashed password on the worker pool
+    return get_hasher().verify(password, hashed_password).result()
@@ -3,25 +3,64 @@
     This module provide a function to obfuscate specified fields
     in log messages.
 """
+import atexit
+import copy
 import logging
+import logging.handlers
+import queue
 import re
+import sys
 import os
+import threading
+import time
+import warnings
 import mysql.connector
+from contextlib import contextmanager
 from datetime import datetime
-from typing import List
+from functools import lru_cache, partial
+from typing import (Any, Callable, ContextManager, Iterator, List,
+                    Tuple)
 
 
 # Define the fields considered as PII
 PII_FIELDS = ("email", "ssn", "password", "phone", "address")
 
 
+@lru_cache(maxsize=128)
+def _compile_redactor(fields: Tuple[str, ...], redaction: str,
+                      separator: str) -> Callable[[str], str]:
+    """
+    Compiles, once per field set, redaction and separator, a function
+    rewriting the `field=value` pairs of a message in a single pass.
+
+    Each field becomes a fixed-width lookbehind, so only the value is
+    matched and the replacement is a plain literal: the substitution
+    runs entirely inside the regex engine, without a Python callback
+    per match. A leading one-character `=` lookbehind rejects most
+    positions before the field alternatives are tried. Fields that
+    cannot be used in a lookbehind, or a separator containing `=` (with
+    which a lookbehind could see a field the previous match consumed),
+    fall back to the `field=value` pattern.
+    """
+    literal = redaction.replace('\\', r'\\')
+    value = f'[^{separator}"]+'
+    if '=' not in separator and all('=' not in field for field in fields):
+        try:
+            lookbehinds = "|".join(f'(?<={field}=)' for field in fields)
+            pattern = re.compile(f'(?<==)(?:{lookbehinds}){value}')
+            return partial(pattern.sub, literal)
+        except re.error:
+            pass
+    pattern = re.compile(f'({"|".join(fields)})={value}')
+    return partial(pattern.sub, r'\g<1>=' + literal)
+
+
 def filter_datum(fields: List[str], redaction: str, message: str,
                  separator: str) -> str:
     """
     Obfuscates the value of specified fields in a log message.
     """
-    pattern = f'({"|".join(fields)})=[^{separator}"]+'
-    return re.sub(pattern, lambda x: f'{x.group(1)}={redaction}', message)
+    return _compile_redactor(tuple(fields), redaction, separator)(message)
 
 
 class RedactingFormatter(logging.Formatter):
@@ -33,24 +72,144 @@ class RedactingFormatter(logging.Formatter):
     FORMAT = "[HOLBERTON] %(name)s %(levelname)s %(asctime)-15s: %(message)s"
     SEPARATOR = ";"
 
-    def __init__(self, fields: List[str]):
-        """ Initialize RedactingFormatter with fields to be obfuscated."""
+    def __init__(self, fields: List[str], preserve_record: bool = False):
+        """ Initialize RedactingFormatter with fields to be obfuscated.
+
+        With `preserve_record`, only the formatted output is redacted and
+        the record is left untouched for the other handlers.
+        """
         super(RedactingFormatter, self).__init__(self.FORMAT)
-        self.fields = fields
+        self.preserve_record = preserve_record
+        self._key = (tuple(fields), self.REDACTION, self.SEPARATOR)
+        self.redactor = _compile_redactor(*self._key)
+
+    @property
+    def fields(self) -> Tuple[str, ...]:
+        """ The fields to be obfuscated. """
+        return self._key[0]
+
+    def redact(self, record: logging.LogRecord) -> str:
+        """ Return the redacted message of a record.
+
+        The result is cached on the record, so every handler formatting it
+        with the same fields shares a single redaction pass.
+        """
+        cache = record.__dict__.setdefault('_redacted_messages', {})
+        message = cache.get(self._key)
+        if message is None:
+            message = self.redactor(record.getMessage())
+            cache[self._key] = message
+        return message
 
     def format(self, record: logging.LogRecord) -> str:
         """ Format the log record, obfuscating specified fields. """
-        record.msg = filter_datum(self.fields, self.REDACTION, record.msg,
-                                  self.SEPARATOR)
-        return super().format(record)
+        if not self.preserve_record:
+            cache = record.__dict__.setdefault('_redacted_messages', {})
+            if cache.get(('msg',) + self._key) is not record.msg:
+                record.msg = self.redactor(record.msg)
+                cache[('msg',) + self._key] = record.msg
+            return super().format(record)
+        redacted = copy.copy(record)
+        redacted.msg, redacted.args = self.redact(record), None
+        return super().format(redacted)
+
+
+_EXCEPTION_FORMATTER = logging.Formatter()
+
+
+class BoundedQueueHandler(logging.handlers.QueueHandler):
+    """
+    Queue handler with a bounded queue and an overflow policy applied
+    when the queue is full:
+      - "drop": discard the record,
+      - "block": wait for room in the queue,
+      - "sample": keep one record out of `sample_rate`, drop the others.
+    Dropped records are counted in `dropped`.
+    """
 
+    OVERFLOW_POLICIES = ("drop", "block", "sample")
 
-def get_logger() -> logging.Logger:
+    def __init__(self, max_size: int = 10000, overflow: str = "drop",
+                 sample_rate: int = 10):
+        """ Initialize BoundedQueueHandler with its queue settings."""
+        if overflow not in self.OVERFLOW_POLICIES:
+            raise ValueError(f"Unknown overflow policy: {overflow}")
+        super().__init__(queue.Queue(max_size))
+        self.overflow = overflow
+        self.sample_rate = max(sample_rate, 1)
+        self.dropped = 0
+        self._overflowed = 0
+        self._lock = threading.Lock()
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        """
+        Merge the arguments into a copy of the record without formatting
+        it, so that redaction happens on the listener thread.
+        """
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info and not record.exc_text:
+            record.exc_text = _EXCEPTION_FORMATTER.formatException(
+                record.exc_info)
+        record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        """ Put a record in the queue, applying the overflow policy."""
+        if self.overflow == "block":
+            self.queue.put(record)
+            return
+        try:
+            self.queue.put_nowait(record)
+            return
+        except queue.Full:
+            pass
+        with self._lock:
+            self._overflowed += 1
+            keep = self.overflow == "sample" and \
+                self._overflowed % self.sample_rate == 0
+            if not keep:
+                self.dropped += 1
+        if keep:
+            self.queue.put(record)
+
+
+class DrainingQueueListener(logging.handlers.QueueListener):
+    """
+    QueueListener whose stop() waits for room in a full bounded queue
+    instead of failing with queue.Full, so the records queued before
+    it are all handled before the listener thread ends.
+    """
+
+    def enqueue_sentinel(self) -> None:
+        """ Put the stop sentinel behind the queued records."""
+        self.queue.put(self._sentinel)
+
+
+def get_logger(queued: bool = False, max_queue_size: int = 10000,
+               overflow: str = "drop") -> logging.Logger:
     """
     Configures and returns a logger object with RedactingFormatter.
     The logger is name 'user_data' and will log messages up to INFO level.
+
+    The logger is configured once: later calls return it unchanged,
+    with a RuntimeWarning if they ask for other queue settings than the
+    ones it was configured with.
+    With `queued`, log calls only enqueue the record on a bounded queue
+    (see BoundedQueueHandler); redaction and I/O run on a background
+    QueueListener thread, stopped and drained at exit.
     """
     logger = logging.getLogger("user_data")
+    settings = (queued, max_queue_size, overflow) if queued else (False,)
+    if getattr(logger, "_redacting_handler", None) is not None:
+        if logger._redacting_settings != settings:
+            warnings.warn(
+                "'user_data' logger already configured with queue settings "
+                "{}, ignoring {}".format(logger._redacting_settings,
+                                         settings),
+                RuntimeWarning, stacklevel=2)
+        return logger
     logger.setLevel(logging.INFO)  # Set log level to INFO
     logger.propagate = False  # Prevent propagation to other loggers
 
@@ -61,8 +220,19 @@ def get_logger() -> logging.Logger:
     formatter = RedactingFormatter(fields=PII_FIELDS)
     stream_handler.setFormatter(formatter)
 
+    handler = stream_handler
+    if queued:
+        handler = BoundedQueueHandler(max_queue_size, overflow)
+        listener = DrainingQueueListener(
+            handler.queue, stream_handler, respect_handler_level=True)
+        listener.start()
+        atexit.register(listener.stop)
+        handler.listener = listener
+
     # Add the handler to the logger
-    logger.addHandler(stream_handler)
+    logger.addHandler(handler)
+    logger._redacting_handler = handler
+    logger._redacting_settings = settings
 
     return logger
 
@@ -97,3 +267,193 @@ def get_db() -> mysql.connector.connection.MySQLConnection:
             database=db_name
             )
     return db_connection
+
+
+class ConnectionPool:
+    """
+    Pool of database connections created by `connect`, any DB-API
+    driver will do (MySQL in production, SQLite or a fake in tests).
+
+    At most `size` connections are checked out at once. Idle connections
+    older than `idle_timeout` seconds are closed, and every connection
+    is health-checked before being handed out.
+    """
+
+    def __init__(self, connect: Callable[[], Any], size: int = 5,
+                 idle_timeout: float = 300.0,
+                 checkout_timeout: float = 30.0):
+        """ Initialize ConnectionPool with its connection factory."""
+        self._connect = connect
+        self.size = size
+        self.idle_timeout = idle_timeout
+        self.checkout_timeout = checkout_timeout
+        self._idle = []
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(size)
+
+    @staticmethod
+    def _is_healthy(connection: Any) -> bool:
+        """ Check that a connection still reaches the database."""
+        try:
+            if hasattr(connection, "is_connected"):
+                return connection.is_connected()
+            cursor = connection.cursor()
+            cursor.execute("SELECT 1")
+            cursor.fetchall()
+            cursor.close()
+            return True
+        except Exception:
+            return False
+
+    @staticmethod
+    def _close(connection: Any) -> None:
+        """ Close a connection, ignoring errors."""
+        try:
+            connection.close()
+        except Exception:
+            pass
+
+    def acquire(self) -> Any:
+        """
+        Check a connection out of the pool, reusing a healthy idle one
+        or opening a new one. Raises TimeoutError when the pool stays
+        exhausted for `checkout_timeout` seconds.
+        """
+        if not self._slots.acquire(timeout=self.checkout_timeout):
+            raise TimeoutError("Database connection pool exhausted.")
+        try:
+            while True:
+                with self._lock:
+                    if len(self._idle) == 0:
+                        break
+                    connection, released_at = self._idle.pop()
+                if time.monotonic() - released_at > self.idle_timeout or \
+                        not self._is_healthy(connection):
+                    self._close(connection)
+                    continue
+                return connection
+            return self._connect()
+        except BaseException:
+            self._slots.release()
+            raise
+
+    def release(self, connection: Any, discard: bool = False) -> None:
+        """
+        Return a checked out connection to the pool, rolling back any
+        pending transaction; `discard` closes it instead.
+        """
+        try:
+            if not discard:
+                try:
+                    connection.rollback()
+                except Exception:
+                    discard = True
+            if discard:
+                self._close(connection)
+            else:
+                with self._lock:
+                    self._idle.append((connection, time.monotonic()))
+        finally:
+            self._slots.release()
+
+    @contextmanager
+    def connection(self) -> Iterator[Any]:
+        """ Check a connection out for the duration of a `with` block."""
+        connection = self.acquire()
+        try:
+            yield connection
+        except BaseException:
+            self.release(connection, discard=not self._is_healthy(connection))
+            raise
+        self.release(connection)
+
+    def close(self) -> None:
+        """ Close every idle connection."""
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for connection, _ in idle:
+            self._close(connection)
+
+
+_DB_POOL = None
+_DB_POOL_LOCK = threading.Lock()
+
+
+def get_db_pool() -> ConnectionPool:
+    """
+    Return the process-wide pool of connections opened with get_db(),
+    sized by PERSONAL_DATA_DB_POOL_SIZE (default 5) and closing idle
+    connections after PERSONAL_DATA_DB_POOL_IDLE_TIMEOUT seconds
+    (default 300).
+    """
+    global _DB_POOL
+    with _DB_POOL_LOCK:
+        if _DB_POOL is None:
+            size = int(os.getenv("PERSONAL_DATA_DB_POOL_SIZE", "5"))
+            idle_timeout = float(
+                os.getenv("PERSONAL_DATA_DB_POOL_IDLE_TIMEOUT", "300"))
+            _DB_POOL = ConnectionPool(get_db, size, idle_timeout)
+            atexit.register(_DB_POOL.close)
+        return _DB_POOL
+
+
+def db_connection() -> ContextManager[Any]:
+    """
+    Check a pooled database connection out for a `with` block:
+
+        with db_connection() as db:
+            cursor = db.cursor()
+    """
+    return get_db_pool().connection()
+
+
+def stream_users(batch_size: int = 1000) -> Iterator[str]:
+    """
+    Yield the rows of the users table one by one, formatted as
+    `field=value;` pairs and with the PII_FIELDS values redacted.
+
+    Rows are fetched `batch_size` at a time on a pooled connection, so
+    memory stays constant whatever the size of the table.
+    """
+    with db_connection() as db:
+        cursor = db.cursor()
+        try:
+            cursor.execute("SELECT * FROM users;")
+            fields = [column[0] for column in cursor.description]
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                for row in rows:
+                    message = "".join(
+                        f"{field}={value}; "
+                        for field, value in zip(fields, row)
+                    ).rstrip()
+                    yield filter_datum(PII_FIELDS,
+                                       RedactingFormatter.REDACTION,
+                                       message,
+                                       RedactingFormatter.SEPARATOR)
+        finally:
+            cursor.close()
+
+
+def main() -> None:
+    """
+    Log every row of the users table through the redacting logger,
+    then report the throughput on stderr.
+    """
+    logger = get_logger()
+    batch_size = int(os.getenv("PERSONAL_DATA_EXPORT_BATCH_SIZE", "1000"))
+    start = time.monotonic()
+    count = 0
+    for message in stream_users(batch_size):
+        logger.info(message)
+        count += 1
+    elapsed = time.monotonic() - start
+    rate = count / elapsed if elapsed > 0 else 0.0
+    print(f"Exported {count} rows in {elapsed:.2f}s ({rate:.0f} rows/sec)",
+          file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
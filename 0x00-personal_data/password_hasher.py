@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""A module running bcrypt hashing off the request threads.
+"""
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Union
+
+import bcrypt
+
+
+DEFAULT_ROUNDS = 12
+MIN_ROUNDS = 4
+MAX_ROUNDS = 31
+
+
+def hash_rounds(hashed_password: Union[bytes, str]) -> int:
+    """Returns the cost factor of a bcrypt hash (`$2b$<cost>$...`),
+    or 0 if it cannot be read.
+    """
+    if isinstance(hashed_password, bytes):
+        hashed_password = hashed_password.decode("ascii", "replace")
+    parts = str(hashed_password).split("$")
+    try:
+        return int(parts[2])
+    except (IndexError, ValueError):
+        return 0
+
+
+def calibrate_rounds(target_ms: float = 250.0,
+                     min_rounds: int = 10, max_rounds: int = 16) -> int:
+    """Benchmarks bcrypt on this host and returns the highest cost
+    factor, between `min_rounds` and `max_rounds`, whose hash time
+    stays within `target_ms` milliseconds.
+
+    Each extra round doubles the work, so the time measured at
+    `min_rounds` is extrapolated, then checked at the chosen cost.
+    """
+    def _measure(rounds: int) -> float:
+        salt = bcrypt.gensalt(rounds)
+        start = time.perf_counter()
+        bcrypt.hashpw(b"calibration", salt)
+        return (time.perf_counter() - start) * 1000
+
+    base = _measure(min_rounds)
+    rounds = min_rounds
+    while rounds < max_rounds and base * 2 ** (rounds + 1 - min_rounds) \
+            <= target_ms:
+        rounds += 1
+    while rounds > min_rounds and _measure(rounds) > target_ms:
+        rounds -= 1
+    return rounds
+
+
+def rounds_from_env() -> int:
+    """Returns the bcrypt cost factor set by BCRYPT_ROUNDS, or else
+    calibrated for BCRYPT_TARGET_MS milliseconds per hash, or else
+    bcrypt's default.
+    """
+    rounds = os.getenv("BCRYPT_ROUNDS")
+    if rounds is not None:
+        return min(max(int(rounds), MIN_ROUNDS), MAX_ROUNDS)
+    target_ms = os.getenv("BCRYPT_TARGET_MS")
+    if target_ms is not None:
+        return calibrate_rounds(float(target_ms))
+    return DEFAULT_ROUNDS
+
+
+class HasherBusyError(RuntimeError):
+    """Raised when the password hasher has too many pending jobs.
+    """
+
+
+class PasswordHasher:
+    """Bounded pool of bcrypt workers.
+
+    bcrypt releases the GIL while hashing, so a thread pool runs hashes
+    in parallel. At most `max_pending` jobs may be queued or running:
+    beyond that, `hash` and `verify` fail fast with HasherBusyError
+    instead of letting requests pile up behind the workers.
+
+    New hashes use `rounds` as bcrypt cost factor.
+    """
+
+    def __init__(self, max_workers: int = 4, max_pending: int = 64,
+                 rounds: int = DEFAULT_ROUNDS) -> None:
+        """Initializes a new PasswordHasher instance.
+        """
+        self.rounds = rounds
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers,
+            thread_name_prefix="bcrypt",
+        )
+
+    def _submit(self, fn, *args) -> Future:
+        """Queues a job if the pending-job limit allows it.
+        """
+        if not self._slots.acquire(blocking=False):
+            raise HasherBusyError("Password hasher is saturated")
+
+        def _run():
+            try:
+                return fn(*args)
+            finally:
+                self._slots.release()
+
+        try:
+            future = self._executor.submit(_run)
+        except BaseException:
+            self._slots.release()
+            raise
+        future.add_done_callback(
+            lambda f: self._slots.release() if f.cancelled() else None)
+        return future
+
+    def hash(self, password: str) -> Future:
+        """Hashes a password with a new salt, as a Future of bytes.
+        """
+        return self._submit(_hash, password, self.rounds)
+
+    def verify(self, password: str, hashed_password: bytes) -> Future:
+        """Checks a password against a hash, as a Future of bool.
+        """
+        return self._submit(_verify, password, hashed_password)
+
+    def needs_rehash(self, hashed_password: Union[bytes, str]) -> bool:
+        """Checks if a hash was made with a lower cost than `rounds`.
+
+        Stronger hashes are kept, so workers calibrated to slightly
+        different costs, or a lowered BCRYPT_ROUNDS, never rehash back
+        and forth nor downgrade stored hashes.
+        """
+        return hash_rounds(hashed_password) < self.rounds
+
+    def shutdown(self) -> None:
+        """Waits for the pending jobs and stops the workers.
+        """
+        self._executor.shutdown(wait=True)
+
+
+def _hash(password: str, rounds: int = DEFAULT_ROUNDS) -> bytes:
+    """Hashes a password with a new salt.
+    """
+    return bcrypt.hashpw(password.encode("utf-8"), bcrypt.gensalt(rounds))
+
+
+def _verify(password: str, hashed_password: bytes) -> bool:
+    """Checks a password against a hash.
+    """
+    return bcrypt.checkpw(password.encode("utf-8"), hashed_password)
+
+
+_HASHER = None
+_HASHER_LOCK = threading.Lock()
+
+
+def get_hasher() -> PasswordHasher:
+    """Returns the process-wide hasher, sized by BCRYPT_WORKERS
+    (default: CPU count) and BCRYPT_MAX_PENDING (default: 64), with
+    the cost factor of rounds_from_env().
+    """
+    global _HASHER
+    with _HASHER_LOCK:
+        if _HASHER is None:
+            workers = int(os.getenv("BCRYPT_WORKERS", os.cpu_count() or 1))
+            max_pending = int(os.getenv("BCRYPT_MAX_PENDING", "64"))
+            _HASHER = PasswordHasher(workers, max_pending, rounds_from_env())
+        return _HASHER
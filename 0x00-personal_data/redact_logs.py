@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+    This module provides a command line tool re-redacting log files in
+    parallel with the same rules as filter_datum.
+
+    Usage: ./redact_logs.py [options] INPUT [-o OUTPUT]
+"""
+import argparse
+import mmap
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterator, List, Tuple
+
+from filtered_logger import PII_FIELDS, RedactingFormatter, _compile_redactor
+
+
+def chunk_bounds(data: mmap.mmap,
+                 chunk_size: int) -> Iterator[Tuple[int, int]]:
+    """
+    Split a memory-mapped file into (start, end) chunks of about
+    `chunk_size` bytes, each ending on a line boundary.
+    """
+    start, size = 0, len(data)
+    while start < size:
+        end = data.find(b"\n", min(start + chunk_size, size) - 1)
+        end = size if end == -1 else end + 1
+        yield start, end
+        start = end
+
+
+def redact_chunk(path: str, start: int, end: int, fields: Tuple[str, ...],
+                 redaction: str, separator: str) -> bytes:
+    """
+    Redact the lines between two offsets of a file, one line at a time
+    as filter_datum would.
+    """
+    redact = _compile_redactor(fields, redaction, separator)
+    with open(path, "rb") as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            text = data[start:end].decode("utf-8", "surrogateescape")
+    lines = text.split("\n")
+    return "\n".join(map(redact, lines)).encode("utf-8", "surrogateescape")
+
+
+def redact_file(path: str, output, fields: List[str], redaction: str,
+                separator: str, workers: int, chunk_size: int) -> int:
+    """
+    Redact a log file across `workers` processes and write the result,
+    in order, to the binary stream `output`. Returns the bytes read.
+    """
+    size = os.path.getsize(path)
+    if size == 0:
+        return 0
+    with open(path, "rb") as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            bounds = list(chunk_bounds(data, chunk_size))
+    args = (tuple(fields), redaction, separator)
+    pending = deque()
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for start, end in bounds:
+            pending.append(executor.submit(
+                redact_chunk, path, start, end, *args))
+            if len(pending) >= 2 * workers:
+                output.write(pending.popleft().result())
+        while pending:
+            output.write(pending.popleft().result())
+    return size
+
+
+def main() -> None:
+    """
+    Parse the command line and redact the given log file.
+    """
+    parser = argparse.ArgumentParser(
+        description="Re-redact a log file in parallel.")
+    parser.add_argument("input", help="log file to redact")
+    parser.add_argument("-o", "--output",
+                        help="redacted file (default: standard output)")
+    parser.add_argument("-f", "--fields", default=",".join(PII_FIELDS),
+                        help="comma-separated fields to redact")
+    parser.add_argument("-s", "--separator",
+                        default=RedactingFormatter.SEPARATOR)
+    parser.add_argument("-r", "--redaction",
+                        default=RedactingFormatter.REDACTION)
+    parser.add_argument("-w", "--workers", type=int,
+                        default=os.cpu_count() or 1)
+    parser.add_argument("-c", "--chunk-size", type=int, default=16,
+                        help="chunk size in MiB (default: 16)")
+    options = parser.parse_args()
+
+    fields = [field for field in options.fields.split(",") if field]
+    output = sys.stdout.buffer
+    if options.output is not None:
+        output = open(options.output, "wb")
+    start = time.monotonic()
+    try:
+        size = redact_file(options.input, output, fields, options.redaction,
+                           options.separator, max(options.workers, 1),
+                           max(options.chunk_size, 1) << 20)
+    finally:
+        if options.output is not None:
+            output.close()
+        else:
+            output.flush()
+    elapsed = time.monotonic() - start
+    rate = size / elapsed / (1 << 20) if elapsed > 0 else 0.0
+    print(f"Redacted {size} bytes in {elapsed:.2f}s ({rate:.1f} MiB/s)",
+          file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,28 +1,67 @@
 #!/usr/bin/env python3
 """Authentication module for the API.
 """
-import re
-from typing import List, TypeVar
+from functools import lru_cache
+from typing import List, TypeVar, Union
 from flask import request
 
 
+class PathMatcher:
+    """Prefix trie of excluded paths, built once and matched in
+    O(len(path)) whatever the number of exclusions.
+
+    An exclusion ending with `*` or `/` matches any path starting with
+    the part before it; any other exclusion matches any path starting
+    with it, like the original per-request regular expressions did.
+    """
+
+    def __init__(self, excluded_paths: List[str]) -> None:
+        """Initializes a new PathMatcher instance.
+        """
+        self._root = {}
+        for exclusion_path in map(lambda x: x.strip(), excluded_paths):
+            if len(exclusion_path) == 0:
+                continue
+            if exclusion_path[-1] in ('*', '/'):
+                exclusion_path = exclusion_path[0:-1]
+            node = self._root
+            for char in exclusion_path:
+                node = node.setdefault(char, {})
+            node[None] = True
+
+    def match(self, path: str) -> bool:
+        """Checks if a path is covered by one of the exclusions.
+        """
+        node = self._root
+        if None in node:
+            return True
+        for char in path:
+            node = node.get(char)
+            if node is None:
+                return False
+            if None in node:
+                return True
+        return False
+
+
+@lru_cache(maxsize=32)
+def _path_matcher(excluded_paths: tuple) -> PathMatcher:
+    """Builds the matcher of a list of excluded paths once.
+    """
+    return PathMatcher(excluded_paths)
+
+
 class Auth:
     """Authentication class.
     """
-    def require_auth(self, path: str, excluded_paths: List[str]) -> bool:
+    def require_auth(self, path: str,
+                     excluded_paths: Union[List[str], 'PathMatcher']) -> bool:
         """Checks if a path requires authentication.
         """
         if path is not None and excluded_paths is not None:
-            for exclusion_path in map(lambda x: x.strip(), excluded_paths):
-                pattern = ''
-                if exclusion_path[-1] == '*':
-                    pattern = '{}.*'.format(exclusion_path[0:-1])
-                elif exclusion_path[-1] == '/':
-                    pattern = '{}/*'.format(exclusion_path[0:-1])
-                else:
-                    pattern = '{}/*'.format(exclusion_path)
-                if re.match(pattern, path):
-                    return False
+            if not isinstance(excluded_paths, PathMatcher):
+                excluded_paths = _path_matcher(tuple(excluded_paths))
+            return not excluded_paths.match(path)
         return True
 
     def authorization_header(self, request=None) -> str:
@@ -1,18 +1,97 @@
 #!/usr/bin/env python3
 """Basic authentication module for the API.
 """
+import os
 import re
+import hmac
+import time
 import base64
+import hashlib
 import binascii
+import threading
+from collections import OrderedDict
 from typing import Tuple, TypeVar
 
 from .auth import Auth
 from models.user import User
 
 
+class CredentialCache:
+    """Bounded cache of verified Basic authorization headers.
+
+    Entries are keyed by an HMAC of the header under a per-process
+    random key, so no plaintext credentials are kept. An entry holds the
+    user's id, email and password hash at verification time and is
+    dropped as soon as the stored user no longer matches, i.e. once
+    `User.save()` changed the password or email or `User.remove()` ran.
+    """
+
+    def __init__(self, max_size: int = 1024, ttl: float = 60) -> None:
+        """Initializes a new CredentialCache instance.
+        """
+        self.max_size = max_size
+        self.ttl = ttl
+        self._key = os.urandom(32)
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _digest(self, authorization_header: str) -> bytes:
+        """Computes the cache key of an authorization header.
+        """
+        return hmac.new(
+            self._key,
+            authorization_header.encode('utf-8'),
+            hashlib.sha256,
+        ).digest()
+
+    def get(self, authorization_header: str) -> TypeVar('User'):
+        """Retrieves the user verified for an authorization header.
+        """
+        if type(authorization_header) != str or self.max_size <= 0:
+            return None
+        digest = self._digest(authorization_header)
+        with self._lock:
+            entry = self._entries.get(digest)
+            if entry is None:
+                return None
+            user_id, email, password, expires_at = entry
+            user = User.get(user_id)
+            if expires_at <= time.monotonic() or user is None or \
+                    user.email != email or user.password != password:
+                del self._entries[digest]
+                return None
+            self._entries.move_to_end(digest)
+            return user
+
+    def put(self, authorization_header: str, user: TypeVar('User')) -> None:
+        """Stores the user verified for an authorization header.
+        """
+        if type(authorization_header) != str or self.max_size <= 0:
+            return
+        digest = self._digest(authorization_header)
+        expires_at = time.monotonic() + self.ttl
+        with self._lock:
+            self._entries[digest] = (
+                user.id, user.email, user.password, expires_at)
+            self._entries.move_to_end(digest)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+
 class BasicAuth(Auth):
     """Basic authentication class.
     """
+
+    def __init__(self) -> None:
+        """Initializes a new BasicAuth instance.
+        """
+        try:
+            max_size = int(os.getenv('BASIC_AUTH_CACHE_SIZE', '1024'))
+            ttl = float(os.getenv('BASIC_AUTH_CACHE_TTL', '60'))
+        except ValueError:
+            max_size, ttl = 1024, 60
+        self.credential_cache = CredentialCache(max_size, ttl)
+
     def extract_base64_authorization_header(
             self,
             authorization_header: str) -> str:
@@ -82,7 +161,13 @@ class BasicAuth(Auth):
         """Retrieves the user from a request.
         """
         auth_header = self.authorization_header(request)
+        user = self.credential_cache.get(auth_header)
+        if user is not None:
+            return user
         b64_auth_token = self.extract_base64_authorization_header(auth_header)
         auth_token = self.decode_base64_authorization_header(b64_auth_token)
         email, password = self.extract_user_credentials(auth_token)
-        return self.user_object_from_credentials(email, password)
+        user = self.user_object_from_credentials(email, password)
+        if user is not None:
+            self.credential_cache.put(auth_header, user)
+        return user
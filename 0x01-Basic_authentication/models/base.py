@@ -10,11 +10,62 @@ import uuid
 
 TIMESTAMP_FORMAT = "%Y-%m-%dT%H:%M:%S"
 DATA = {}
+INDEXES = {}
+
+
+def _index_add(s_class: str, obj: TypeVar('Base')) -> None:
+    """ Register an object in the attribute indexes of its class
+    """
+    indexes = INDEXES.get(s_class)
+    if indexes is None:
+        return
+    keys = indexes['keys']
+    if keys.get(obj.id) is not None:
+        _index_discard(s_class, obj.id)
+    obj_keys = {}
+    for attr, buckets in indexes['attrs'].items():
+        value = getattr(obj, attr, None)
+        try:
+            buckets.setdefault(value, {})[obj.id] = obj
+        except TypeError:
+            continue
+        obj_keys[attr] = value
+    keys[obj.id] = obj_keys
+
+
+def _index_discard(s_class: str, obj_id: str) -> None:
+    """ Unregister an object from the attribute indexes of its class
+    """
+    indexes = INDEXES.get(s_class)
+    if indexes is None:
+        return
+    obj_keys = indexes['keys'].pop(obj_id, None)
+    if obj_keys is None:
+        return
+    for attr, value in obj_keys.items():
+        bucket = indexes['attrs'][attr].get(value)
+        if bucket is None:
+            continue
+        bucket.pop(obj_id, None)
+        if len(bucket) == 0:
+            del indexes['attrs'][attr][value]
+
+
+def _index_rebuild(s_class: str, attributes: Iterable[str]) -> None:
+    """ (Re)build the attribute indexes of a class from DATA
+    """
+    INDEXES[s_class] = {
+        'attrs': {attr: {} for attr in attributes},
+        'keys': {},
+    }
+    for obj in DATA.get(s_class, {}).values():
+        _index_add(s_class, obj)
 
 
 class Base():
     """ Base class
     """
+    indexed_attributes = ()
 
     def __init__(self, *args: list, **kwargs: dict):
         """ Initialize a Base instance
@@ -22,6 +73,8 @@ class Base():
         s_class = str(self.__class__.__name__)
         if DATA.get(s_class) is None:
             DATA[s_class] = {}
+        if INDEXES.get(s_class) is None:
+            _index_rebuild(s_class, self.__class__.indexed_attributes)
 
         self.id = kwargs.get('id', str(uuid.uuid4()))
         if kwargs.get('created_at') is not None:
@@ -64,6 +117,7 @@ class Base():
         s_class = cls.__name__
         file_path = ".db_{}.json".format(s_class)
         DATA[s_class] = {}
+        _index_rebuild(s_class, cls.indexed_attributes)
         if not path.exists(file_path):
             return
 
@@ -71,6 +125,7 @@ class Base():
             objs_json = json.load(f)
             for obj_id, obj_json in objs_json.items():
                 DATA[s_class][obj_id] = cls(**obj_json)
+        _index_rebuild(s_class, cls.indexed_attributes)
 
     @classmethod
     def save_to_file(cls):
@@ -91,6 +146,7 @@ class Base():
         s_class = self.__class__.__name__
         self.updated_at = datetime.utcnow()
         DATA[s_class][self.id] = self
+        _index_add(s_class, self)
         self.__class__.save_to_file()
 
     def remove(self):
@@ -99,6 +155,7 @@ class Base():
         s_class = self.__class__.__name__
         if DATA[s_class].get(self.id) is not None:
             del DATA[s_class][self.id]
+            _index_discard(s_class, self.id)
             self.__class__.save_to_file()
 
     @classmethod
@@ -124,8 +181,25 @@ class Base():
     @classmethod
     def search(cls, attributes: dict = {}) -> List[TypeVar('Base')]:
         """ Search all objects with matching attributes
+
+        Equality on an attribute listed in `indexed_attributes` is
+        resolved through the class index, the other attributes are
+        then checked on the (usually tiny) candidate set.
         """
         s_class = cls.__name__
+        candidates = DATA[s_class].values()
+        indexes = INDEXES.get(s_class)
+        if indexes is not None:
+            for k, v in attributes.items():
+                buckets = indexes['attrs'].get(k)
+                if buckets is None:
+                    continue
+                try:
+                    candidates = buckets.get(v, {}).values()
+                except TypeError:
+                    continue
+                break
+
         def _search(obj):
             if len(attributes) == 0:
                 return True
@@ -133,5 +207,5 @@ class Base():
                 if (getattr(obj, k) != v):
                     return False
             return True
-        
-        return list(filter(_search, DATA[s_class].values()))
+
+        return list(filter(_search, candidates))
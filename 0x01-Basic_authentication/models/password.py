@@ -0,0 +1,258 @@
+#!/usr/bin/env python3
+"""Password hashing schemes module.
+"""
+import base64
+import hashlib
+import hmac
+import os
+import warnings
+from typing import Dict, Optional
+
+try:
+    import bcrypt
+except ImportError:
+    bcrypt = None
+
+
+class PasswordScheme:
+    """Password hashing scheme interface.
+    """
+    name = None
+
+    def identify(self, hashed: str) -> bool:
+        """Checks if a stored hash was made by this scheme.
+        """
+        raise NotImplementedError()
+
+    def hash(self, pwd: str) -> str:
+        """Hashes a password with the current cost parameters.
+        """
+        raise NotImplementedError()
+
+    def verify(self, pwd: str, hashed: str) -> bool:
+        """Checks a password against a stored hash in constant time.
+        """
+        raise NotImplementedError()
+
+    def needs_update(self, hashed: str) -> bool:
+        """Checks if a stored hash uses outdated cost parameters.
+        """
+        return False
+
+
+class SHA256LegacyScheme(PasswordScheme):
+    """Unsalted SHA256 hex digest, kept to verify and migrate the
+    passwords stored before the other schemes existed.
+    """
+    name = 'sha256-legacy'
+
+    def identify(self, hashed: str) -> bool:
+        """Checks if a stored hash is a bare SHA256 hex digest.
+        """
+        return len(hashed) == 64 and not hashed.startswith('$')
+
+    def hash(self, pwd: str) -> str:
+        """Hashes a password with SHA256.
+        """
+        return hashlib.sha256(pwd.encode()).hexdigest().lower()
+
+    def verify(self, pwd: str, hashed: str) -> bool:
+        """Checks a password against a SHA256 hex digest.
+        """
+        return hmac.compare_digest(self.hash(pwd), hashed.lower())
+
+
+class ScryptScheme(PasswordScheme):
+    """scrypt through hashlib, stored as `$scrypt$n=N,r=R,p=P$salt$key`
+    with the salt and key base64-encoded.
+    """
+    name = 'scrypt'
+
+    def __init__(self, n: int = 2 ** 14, r: int = 8, p: int = 1) -> None:
+        """Initializes a new ScryptScheme instance.
+        """
+        self.n, self.r, self.p = n, r, p
+
+    def _derive(self, pwd: str, salt: bytes, n: int, r: int, p: int) -> bytes:
+        """Derives a 32-byte key from a password.
+        """
+        return hashlib.scrypt(
+            pwd.encode(), salt=salt, n=n, r=r, p=p,
+            maxmem=256 * n * r + (1 << 20), dklen=32,
+        )
+
+    def _params(self, hashed: str) -> Optional[tuple]:
+        """Parses a stored hash into (n, r, p, salt, key).
+        """
+        try:
+            _, _, params, salt, key = hashed.split('$')
+            values = dict(item.split('=') for item in params.split(','))
+            return (
+                int(values['n']), int(values['r']), int(values['p']),
+                base64.b64decode(salt), base64.b64decode(key),
+            )
+        except (ValueError, KeyError):
+            return None
+
+    def identify(self, hashed: str) -> bool:
+        """Checks if a stored hash is a scrypt hash.
+        """
+        return hashed.startswith('$scrypt$')
+
+    def hash(self, pwd: str) -> str:
+        """Hashes a password with scrypt and a random salt.
+        """
+        salt = os.urandom(16)
+        key = self._derive(pwd, salt, self.n, self.r, self.p)
+        return '$scrypt$n={},r={},p={}${}${}'.format(
+            self.n, self.r, self.p,
+            base64.b64encode(salt).decode(),
+            base64.b64encode(key).decode(),
+        )
+
+    def verify(self, pwd: str, hashed: str) -> bool:
+        """Checks a password against a scrypt hash.
+        """
+        params = self._params(hashed)
+        if params is None:
+            return False
+        n, r, p, salt, key = params
+        return hmac.compare_digest(self._derive(pwd, salt, n, r, p), key)
+
+    def needs_update(self, hashed: str) -> bool:
+        """Checks if a scrypt hash uses other cost parameters.
+        """
+        params = self._params(hashed)
+        return params is None or params[:3] != (self.n, self.r, self.p)
+
+
+class BcryptScheme(PasswordScheme):
+    """bcrypt, available when the `bcrypt` package is installed.
+    """
+    name = 'bcrypt'
+
+    def __init__(self, rounds: int = 12) -> None:
+        """Initializes a new BcryptScheme instance.
+        """
+        self.rounds = rounds
+
+    def identify(self, hashed: str) -> bool:
+        """Checks if a stored hash is a bcrypt hash.
+        """
+        return hashed.startswith('$2')
+
+    def hash(self, pwd: str) -> str:
+        """Hashes a password with bcrypt and a random salt.
+        """
+        salt = bcrypt.gensalt(self.rounds)
+        return bcrypt.hashpw(pwd.encode(), salt).decode()
+
+    def verify(self, pwd: str, hashed: str) -> bool:
+        """Checks a password against a bcrypt hash.
+        """
+        try:
+            return bcrypt.checkpw(pwd.encode(), hashed.encode())
+        except ValueError:
+            return False
+
+    def needs_update(self, hashed: str) -> bool:
+        """Checks if a bcrypt hash uses another cost factor.
+        """
+        try:
+            return int(hashed.split('$')[2]) != self.rounds
+        except (IndexError, ValueError):
+            return True
+
+
+SCHEMES: Dict[str, PasswordScheme] = {}
+_REPORTED_SCHEMES = set()
+
+
+def _int_from_env(name: str, default: int, valid) -> int:
+    """Reads an integer setting, falling back to `default` with a
+    warning if it isn't an integer or `valid(value)` is false.
+    """
+    value = os.getenv(name)
+    if value is None:
+        return default
+    try:
+        result = int(value)
+    except ValueError:
+        result = None
+    if result is None or not valid(result):
+        warnings.warn("Invalid {}={!r}, using {}".format(
+            name, value, default), RuntimeWarning)
+        return default
+    return result
+
+
+def register_scheme(scheme: PasswordScheme) -> None:
+    """Makes a scheme available to hash and verify passwords.
+    """
+    SCHEMES[scheme.name] = scheme
+
+
+def identify_scheme(hashed: str) -> Optional[PasswordScheme]:
+    """Returns the scheme a stored hash was made by, if registered.
+    """
+    for scheme in SCHEMES.values():
+        if scheme.identify(hashed):
+            return scheme
+    return None
+
+
+def default_scheme() -> PasswordScheme:
+    """Returns the scheme new passwords are hashed with, set by
+    USER_PASSWORD_SCHEME (default: scrypt); an unknown or unavailable
+    scheme falls back to scrypt with a warning.
+    """
+    name = os.getenv('USER_PASSWORD_SCHEME', 'scrypt')
+    scheme = SCHEMES.get(name)
+    if scheme is None:
+        if name not in _REPORTED_SCHEMES:
+            _REPORTED_SCHEMES.add(name)
+            warnings.warn(
+                "Unknown or unavailable USER_PASSWORD_SCHEME={!r} "
+                "(available: {}), using scrypt".format(
+                    name, ", ".join(sorted(SCHEMES))),
+                RuntimeWarning)
+        scheme = SCHEMES['scrypt']
+    return scheme
+
+
+def hash_password(pwd: str) -> str:
+    """Hashes a password with the default scheme.
+    """
+    return default_scheme().hash(pwd)
+
+
+def verify_password(pwd: str, hashed: str) -> bool:
+    """Checks a password against a stored hash of any registered scheme.
+    """
+    scheme = identify_scheme(hashed)
+    if scheme is None:
+        return False
+    return scheme.verify(pwd, hashed)
+
+
+def needs_rehash(hashed: str) -> bool:
+    """Checks if a stored hash should be replaced by a hash made with
+    the default scheme and its current cost parameters.
+    """
+    scheme = default_scheme()
+    return not scheme.identify(hashed) or scheme.needs_update(hashed)
+
+
+register_scheme(SHA256LegacyScheme())
+register_scheme(ScryptScheme(
+    n=_int_from_env('USER_PASSWORD_SCRYPT_N', 2 ** 14,
+                    lambda n: n > 1 and n & (n - 1) == 0),
+    r=_int_from_env('USER_PASSWORD_SCRYPT_R', 8, lambda r: r > 0),
+    p=_int_from_env('USER_PASSWORD_SCRYPT_P', 1, lambda p: p > 0),
+))
+if bcrypt is not None:
+    register_scheme(BcryptScheme(
+        rounds=_int_from_env('USER_PASSWORD_BCRYPT_ROUNDS', 12,
+                             lambda rounds: 4 <= rounds <= 31),
+    ))
+default_scheme()
@@ -5,13 +5,24 @@ from uuid import uuid4
 from flask import request
 
 from .auth import Auth
+from .session_store import session_store_from_env
 from models.user import User
 
 
 class SessionAuth(Auth):
     """Session authentication class.
     """
-    user_id_by_session_id = {}
+
+    def __init__(self) -> None:
+        """Initializes a new SessionAuth instance.
+
+        The sessions live in the store selected by SESSION_STORE, which
+        expires them after `session_duration` seconds if a subclass
+        sets it to a positive value.
+        """
+        self.user_id_by_session_id = session_store_from_env(
+            ttl=getattr(self, 'session_duration', 0),
+        )
 
     def create_session(self, user_id: str = None) -> str:
         """Creates a session id for the user.
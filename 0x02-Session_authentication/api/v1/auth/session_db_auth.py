@@ -3,7 +3,6 @@
 and storage support module for the API.
 """
 from flask import request
-from datetime import datetime, timedelta
 
 from models.user_session import UserSession
 from .session_exp_auth import SessionExpAuth
@@ -11,6 +10,10 @@ from .session_exp_auth import SessionExpAuth
 
 class SessionDBAuth(SessionExpAuth):
     """Session authentication class with expiration and storage support.
+
+    Sessions are resolved, expired and deleted through the session
+    store, so every worker sharing it sees them; a UserSession is only
+    kept as the persistent record of each session.
     """
 
     def create_session(self, user_id=None) -> str:
@@ -26,32 +29,16 @@ class SessionDBAuth(SessionExpAuth):
             user_session.save()
             return session_id
 
-    def user_id_for_session_id(self, session_id=None):
-        """Retrieves the user id of the user associated with
-        a given session id.
-        """
-        try:
-            sessions = UserSession.search({'session_id': session_id})
-        except Exception:
-            return None
-        if len(sessions) <= 0:
-            return None
-        cur_time = datetime.now()
-        time_span = timedelta(seconds=self.session_duration)
-        exp_time = sessions[0].created_at + time_span
-        if exp_time < cur_time:
-            return None
-        return sessions[0].user_id
-
     def destroy_session(self, request=None) -> bool:
         """Destroys an authenticated session.
         """
         session_id = self.session_cookie(request)
+        if not super().destroy_session(request):
+            return False
         try:
             sessions = UserSession.search({'session_id': session_id})
         except Exception:
-            return False
-        if len(sessions) <= 0:
-            return False
-        sessions[0].remove()
+            sessions = []
+        for user_session in sessions:
+            user_session.remove()
         return True
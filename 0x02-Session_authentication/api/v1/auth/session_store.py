@@ -0,0 +1,483 @@
+#!/usr/bin/env python3
+"""Session store module for the API.
+"""
+import fcntl
+import heapq
+import mmap
+import os
+import sqlite3
+import struct
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, Dict
+
+
+class SessionStore:
+    """Session store interface, mapping session ids to user ids.
+
+    A `ttl` of 0 or less means that a session never expires.
+    """
+    ttl = 0
+
+    def set(self, session_id: str, value: Any, ttl: float = None) -> None:
+        """Stores a session, expiring after `ttl` seconds if positive.
+        """
+        raise NotImplementedError()
+
+    def get(self, session_id: str, default: Any = None) -> Any:
+        """Retrieves a live session.
+        """
+        raise NotImplementedError()
+
+    def delete(self, session_id: str) -> bool:
+        """Removes a session, returning whether it existed.
+        """
+        raise NotImplementedError()
+
+    def sweep(self) -> int:
+        """Evicts every expired session and returns how many were.
+        """
+        return 0
+
+    def stats(self) -> Dict[str, int]:
+        """Returns the live, expired and evicted session counters.
+        """
+        raise NotImplementedError()
+
+    def start_sweeper(self, interval: float) -> None:
+        """Starts a daemon thread sweeping the store every `interval`.
+        """
+        if getattr(self, '_sweeper', None) is not None or interval <= 0:
+            return
+
+        def _run():
+            while True:
+                time.sleep(interval)
+                try:
+                    self.sweep()
+                except Exception:
+                    pass
+
+        self._sweeper = threading.Thread(target=_run, daemon=True)
+        self._sweeper.start()
+
+    def _expires_at(self, ttl: float, now: float) -> float:
+        """Computes an expiration time, None for a session without one.
+        """
+        ttl = self.ttl if ttl is None else ttl
+        return now + ttl if ttl > 0 else None
+
+    def __setitem__(self, session_id: str, value: Any) -> None:
+        """Stores a session with the default time to live.
+        """
+        self.set(session_id, value)
+
+    def __getitem__(self, session_id: str) -> Any:
+        """Retrieves a live session or raises KeyError.
+        """
+        missing = object()
+        value = self.get(session_id, missing)
+        if value is missing:
+            raise KeyError(session_id)
+        return value
+
+    def __delitem__(self, session_id: str) -> None:
+        """Removes a session or raises KeyError.
+        """
+        if not self.delete(session_id):
+            raise KeyError(session_id)
+
+    def __contains__(self, session_id: str) -> bool:
+        """Checks whether a live session exists.
+        """
+        missing = object()
+        return self.get(session_id, missing) is not missing
+
+    def __len__(self) -> int:
+        """Returns the number of stored sessions.
+        """
+        return self.stats()['live']
+
+
+class MemorySessionStore(SessionStore):
+    """Process-local session store.
+
+    Expiration times sit in a min-heap so expired sessions are evicted
+    in amortized O(1) per session, both on writes and from an optional
+    sweeper thread. When `max_size` is positive, the least recently
+    used sessions are evicted to stay within it.
+    """
+
+    def __init__(self, ttl: float = 0, max_size: int = 0) -> None:
+        """Initializes a new MemorySessionStore instance.
+        """
+        self.ttl = ttl
+        self.max_size = max_size
+        self.expired_count = 0
+        self.evicted_count = 0
+        self._entries = OrderedDict()
+        self._expiry_heap = []
+        self._lock = threading.RLock()
+        self._sweeper = None
+
+    def set(self, session_id: str, value: Any, ttl: float = None) -> None:
+        """Stores a session, expiring after `ttl` seconds if positive.
+        """
+        expires_at = self._expires_at(ttl, time.monotonic())
+        with self._lock:
+            self._entries[session_id] = (value, expires_at)
+            self._entries.move_to_end(session_id)
+            if expires_at is not None:
+                heapq.heappush(self._expiry_heap, (expires_at, session_id))
+            self.sweep()
+            while self.max_size > 0 and len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evicted_count += 1
+
+    def get(self, session_id: str, default: Any = None) -> Any:
+        """Retrieves a live session, marking it as recently used.
+        """
+        with self._lock:
+            entry = self._entries.get(session_id)
+            if entry is None:
+                return default
+            if entry[1] is not None and entry[1] <= time.monotonic():
+                del self._entries[session_id]
+                self.expired_count += 1
+                return default
+            self._entries.move_to_end(session_id)
+            return entry[0]
+
+    def delete(self, session_id: str) -> bool:
+        """Removes a session, returning whether it existed.
+        """
+        with self._lock:
+            return self._entries.pop(session_id, None) is not None
+
+    def sweep(self) -> int:
+        """Evicts every expired session and returns how many were.
+        """
+        count = 0
+        now = time.monotonic()
+        with self._lock:
+            heap = self._expiry_heap
+            while len(heap) > 0 and heap[0][0] <= now:
+                expires_at, session_id = heapq.heappop(heap)
+                entry = self._entries.get(session_id)
+                if entry is not None and entry[1] == expires_at:
+                    del self._entries[session_id]
+                    count += 1
+            self.expired_count += count
+        return count
+
+    def stats(self) -> Dict[str, int]:
+        """Returns the live, expired and LRU-evicted session counters.
+        """
+        with self._lock:
+            return {
+                'live': len(self._entries),
+                'expired': self.expired_count,
+                'evicted': self.evicted_count,
+            }
+
+
+class MmapSessionStore(SessionStore):
+    """Session store shared by the processes mapping the same file.
+
+    The file holds a fixed-capacity open-addressing hash table guarded
+    by an exclusive `flock`. Session and user ids are limited to 64
+    bytes each; when the table is full, a colliding session is evicted.
+    """
+    MAGIC = b'SESSMAP1'
+    HEADER = struct.Struct('<8sIQQQ')
+    SLOT = struct.Struct('<Bd64s64s')
+    EMPTY, USED, DELETED = 0, 1, 2
+
+    def __init__(self, path: str, ttl: float = 0,
+                 capacity: int = 65536) -> None:
+        """Initializes a new MmapSessionStore instance.
+        """
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._sweeper = None
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        fcntl.flock(self._fd, fcntl.LOCK_EX)
+        try:
+            header = os.pread(self._fd, self.HEADER.size, 0)
+            if len(header) == self.HEADER.size and \
+                    header[:len(self.MAGIC)] == self.MAGIC:
+                capacity = self.HEADER.unpack(header)[1]
+            else:
+                os.ftruncate(self._fd, 0)
+                os.ftruncate(
+                    self._fd,
+                    self.HEADER.size + capacity * self.SLOT.size,
+                )
+                os.pwrite(
+                    self._fd,
+                    self.HEADER.pack(self.MAGIC, capacity, 0, 0, 0),
+                    0,
+                )
+        finally:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+        self.capacity = capacity
+        self._map = mmap.mmap(
+            self._fd, self.HEADER.size + capacity * self.SLOT.size)
+
+    @contextmanager
+    def _locked(self):
+        """Holds the thread lock and the file lock.
+        """
+        with self._lock:
+            fcntl.flock(self._fd, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+    def _counters(self) -> list:
+        """Reads the live, expired and evicted counters.
+        """
+        return list(self.HEADER.unpack_from(self._map, 0)[2:])
+
+    def _add_counters(self, live=0, expired=0, evicted=0) -> None:
+        """Updates the live, expired and evicted counters.
+        """
+        counters = self._counters()
+        self.HEADER.pack_into(
+            self._map, 0, self.MAGIC, self.capacity,
+            counters[0] + live, counters[1] + expired, counters[2] + evicted,
+        )
+
+    def _slot(self, index: int) -> tuple:
+        """Reads a slot as (state, expires_at, session_id, value).
+        """
+        state, expires_at, key, value = self.SLOT.unpack_from(
+            self._map, self.HEADER.size + index * self.SLOT.size)
+        return state, expires_at, key.rstrip(b'\0'), value.rstrip(b'\0')
+
+    def _write_slot(self, index: int, state: int, expires_at: float = 0,
+                    key: bytes = b'', value: bytes = b'') -> None:
+        """Writes a slot.
+        """
+        self.SLOT.pack_into(
+            self._map, self.HEADER.size + index * self.SLOT.size,
+            state, expires_at, key, value,
+        )
+
+    def _find(self, key: bytes, now: float) -> tuple:
+        """Probes for a key, returning (its slot, the first free slot).
+        Expired sessions met on the way are reclaimed.
+        """
+        free = None
+        start = zlib.crc32(key) % self.capacity
+        for step in range(self.capacity):
+            index = (start + step) % self.capacity
+            state, expires_at, slot_key, _ = self._slot(index)
+            if state == self.EMPTY:
+                return None, index if free is None else free
+            if state == self.USED and 0 < expires_at <= now:
+                self._write_slot(index, self.DELETED)
+                self._add_counters(live=-1, expired=1)
+                state = self.DELETED
+            if state == self.DELETED:
+                if free is None:
+                    free = index
+                continue
+            if slot_key == key:
+                return index, free
+        return None, free
+
+    def set(self, session_id: str, value: Any, ttl: float = None) -> None:
+        """Stores a session, expiring after `ttl` seconds if positive.
+        """
+        now = time.time()
+        key, value = session_id.encode(), str(value).encode()
+        if len(key) > 64 or len(value) > 64:
+            raise ValueError("session or user id longer than 64 bytes")
+        expires_at = self._expires_at(ttl, now) or 0
+        with self._locked():
+            index, free = self._find(key, now)
+            if index is None:
+                if free is None:
+                    index = zlib.crc32(key) % self.capacity
+                    self._add_counters(live=-1, evicted=1)
+                else:
+                    index = free
+                self._add_counters(live=1)
+            self._write_slot(index, self.USED, expires_at, key, value)
+
+    def get(self, session_id: str, default: Any = None) -> Any:
+        """Retrieves a live session.
+        """
+        with self._locked():
+            index, _ = self._find(session_id.encode(), time.time())
+            if index is None:
+                return default
+            return self._slot(index)[3].decode()
+
+    def delete(self, session_id: str) -> bool:
+        """Removes a session, returning whether it existed.
+        """
+        with self._locked():
+            index, _ = self._find(session_id.encode(), time.time())
+            if index is None:
+                return False
+            self._write_slot(index, self.DELETED)
+            self._add_counters(live=-1)
+            return True
+
+    def sweep(self) -> int:
+        """Evicts every expired session and rehashes the live ones,
+        which also clears the deleted-slot markers.
+        """
+        now = time.time()
+        count = 0
+        with self._locked():
+            live = []
+            for index in range(self.capacity):
+                state, expires_at, key, value = self._slot(index)
+                if state == self.USED:
+                    if 0 < expires_at <= now:
+                        count += 1
+                    else:
+                        live.append((expires_at, key, value))
+                self._write_slot(index, self.EMPTY)
+            for expires_at, key, value in live:
+                _, free = self._find(key, now)
+                self._write_slot(free, self.USED, expires_at, key, value)
+            self._add_counters(live=-count, expired=count)
+        return count
+
+    def stats(self) -> Dict[str, int]:
+        """Returns the live, expired and evicted session counters.
+        """
+        with self._locked():
+            live, expired, evicted = self._counters()
+        return {'live': live, 'expired': expired, 'evicted': evicted}
+
+
+class SQLiteSessionStore(SessionStore):
+    """Session store shared by the processes opening the same SQLite
+    file, with one connection per thread.
+    """
+
+    def __init__(self, path: str, ttl: float = 0) -> None:
+        """Initializes a new SQLiteSessionStore instance.
+        """
+        self.ttl = ttl
+        self.path = path
+        self._sweeper = None
+        self._local = threading.local()
+        with self._connection() as conn:
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS sessions ('
+                'session_id TEXT PRIMARY KEY, '
+                'user_id TEXT NOT NULL, '
+                'expires_at REAL)'
+            )
+            conn.execute(
+                'CREATE INDEX IF NOT EXISTS sessions_expires_at '
+                'ON sessions (expires_at)'
+            )
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS session_counters ('
+                'id INTEGER PRIMARY KEY CHECK (id = 0), '
+                'expired INTEGER NOT NULL, '
+                'evicted INTEGER NOT NULL)'
+            )
+            conn.execute(
+                'INSERT OR IGNORE INTO session_counters VALUES (0, 0, 0)')
+
+    def _connection(self) -> sqlite3.Connection:
+        """Returns the connection of the current thread.
+        """
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def set(self, session_id: str, value: Any, ttl: float = None) -> None:
+        """Stores a session, expiring after `ttl` seconds if positive.
+        """
+        expires_at = self._expires_at(ttl, time.time())
+        with self._connection() as conn:
+            conn.execute(
+                'INSERT OR REPLACE INTO sessions VALUES (?, ?, ?)',
+                (session_id, str(value), expires_at),
+            )
+
+    def get(self, session_id: str, default: Any = None) -> Any:
+        """Retrieves a live session.
+        """
+        row = self._connection().execute(
+            'SELECT user_id, expires_at FROM sessions WHERE session_id = ?',
+            (session_id,),
+        ).fetchone()
+        if row is None:
+            return default
+        if row[1] is not None and row[1] <= time.time():
+            self.sweep()
+            return default
+        return row[0]
+
+    def delete(self, session_id: str) -> bool:
+        """Removes a session, returning whether it existed.
+        """
+        with self._connection() as conn:
+            cursor = conn.execute(
+                'DELETE FROM sessions WHERE session_id = ?', (session_id,))
+        return cursor.rowcount > 0
+
+    def sweep(self) -> int:
+        """Evicts every expired session and returns how many were.
+        """
+        with self._connection() as conn:
+            count = conn.execute(
+                'DELETE FROM sessions WHERE expires_at <= ?', (time.time(),),
+            ).rowcount
+            conn.execute(
+                'UPDATE session_counters SET expired = expired + ?', (count,))
+        return count
+
+    def stats(self) -> Dict[str, int]:
+        """Returns the live, expired and evicted session counters.
+        """
+        conn = self._connection()
+        live = conn.execute('SELECT COUNT(*) FROM sessions').fetchone()[0]
+        expired, evicted = conn.execute(
+            'SELECT expired, evicted FROM session_counters').fetchone()
+        return {'live': live, 'expired': expired, 'evicted': evicted}
+
+
+def session_store_from_env(ttl: float = 0) -> SessionStore:
+    """Builds the session store selected by SESSION_STORE, one of
+    `memory` (default), `mmap` or `sqlite`.
+    """
+    store_type = os.getenv('SESSION_STORE', 'memory')
+    try:
+        max_count = int(os.getenv('SESSION_MAX_COUNT', '0'))
+        sweep_interval = float(os.getenv('SESSION_SWEEP_INTERVAL', '60'))
+    except Exception:
+        max_count, sweep_interval = 0, 60
+    if store_type == 'mmap':
+        store = MmapSessionStore(
+            os.getenv('SESSION_STORE_PATH', '.sessions.mmap'),
+            ttl=ttl,
+            capacity=max_count if max_count > 0 else 65536,
+        )
+    elif store_type == 'sqlite':
+        store = SQLiteSessionStore(
+            os.getenv('SESSION_STORE_PATH', '.sessions.db'),
+            ttl=ttl,
+        )
+    else:
+        store = MemorySessionStore(ttl=ttl, max_size=max_count)
+    store.start_sweeper(sweep_interval)
+    return store
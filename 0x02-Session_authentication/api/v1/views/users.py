@@ -1,19 +1,137 @@
 #!/usr/bin/env python3
 """Module of Users views.
 """
+import hashlib
+import json
+import os
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timezone
+from urllib.parse import urlencode
+
 from api.v1.views import app_views
-from flask import abort, jsonify, request
+from flask import Response, abort, jsonify, request
+from models.base import DATA_LOCK
+from models.password import hash_password
 from models.user import User
 
 
+PAGE_MAX_LIMIT = 1000
+STREAM_CHUNK_SIZE = 500
+# Versions restart with the process, so collection ETags also depend
+# on a per-process value to never match a previous run.
+COLLECTION_ETAG_SALT = uuid.uuid4().hex
+BATCH_MAX_SIZE = 1000
+# Hashes the passwords of batch creates; scrypt releases the GIL.
+HASH_EXECUTOR = ThreadPoolExecutor(max_workers=os.cpu_count() or 1,
+                                   thread_name_prefix='batch-hash')
+
+
+def _not_modified(etag: str, last_modified=None) -> bool:
+    """Checks the request's If-None-Match, or else If-Modified-Since,
+    against the current validators of a resource.
+    """
+    if request.if_none_match:
+        return request.if_none_match.contains_weak(etag)
+    if last_modified is not None and request.if_modified_since is not None:
+        return last_modified <= request.if_modified_since
+    return False
+
+
+def _conditional(etag: str, last_modified=None, build=None) -> Response:
+    """Returns 304 if the client's copy is current, or else the response
+    made by `build`, both carrying the resource validators.
+    """
+    if _not_modified(etag, last_modified):
+        response = Response(status=304)
+    else:
+        response = build()
+    response.set_etag(etag)
+    if last_modified is not None:
+        response.last_modified = last_modified
+    return response
+
+
+def _user_response(user: User) -> Response:
+    """Returns a User JSON represented, with an ETag and Last-Modified
+    derived from its ID and last update.
+    """
+    updated_at = user.updated_at.replace(tzinfo=timezone.utc)
+    etag = hashlib.sha1('{}:{}'.format(
+        user.id, updated_at.isoformat()).encode()).hexdigest()
+    return _conditional(etag, updated_at.replace(microsecond=0),
+                        lambda: jsonify(user.to_json()))
+
+
+def _stream_users(after: str = None, limit: int = None):
+    """Yields a JSON array of users chunk by chunk, reading them one
+    page at a time so memory stays bounded by the chunk size.
+    """
+    yield '['
+    first = True
+    while limit is None or limit > 0:
+        size = STREAM_CHUNK_SIZE if limit is None \
+            else min(limit, STREAM_CHUNK_SIZE)
+        users = User.page(after=after, limit=size)
+        if len(users) == 0:
+            break
+        chunk = ','.join(json.dumps(user.to_json()) for user in users)
+        yield chunk if first else ',' + chunk
+        first = False
+        after = users[-1].id
+        if limit is not None:
+            limit -= len(users)
+    yield ']'
+
+
+def _users_page(after: str, limit: int) -> Response:
+    """Returns a page of Users with a Link header to the next page.
+    """
+    limit = min(limit or PAGE_MAX_LIMIT, PAGE_MAX_LIMIT)
+    users = User.page(after=after, limit=limit + 1)
+    response = jsonify([user.to_json() for user in users[:limit]])
+    if len(users) > limit:
+        response.headers['Link'] = '<{}?{}>; rel="next"'.format(
+            request.base_url,
+            urlencode({'limit': limit, 'after': users[limit - 1].id}),
+        )
+    return response
+
+
 @app_views.route('/users', methods=['GET'], strict_slashes=False)
 def view_all_users() -> str:
     """GET /api/v1/users
+    Query parameters (optional):
+      - limit: page size, up to PAGE_MAX_LIMIT.
+      - after: ID of the last User of the previous page.
+      - stream: 1 to stream the Users as a JSON array.
     Return:
-      - list of all User objects JSON represented.
+      - list of User objects JSON represented, ordered by ID when
+        paginated, with a `Link: <...>; rel="next"` header if more
+        Users follow.
+      - 304 if the Users didn't change since the ETag sent in
+        If-None-Match.
+      - 400 if limit isn't a positive integer.
     """
-    all_users = [user.to_json() for user in User.all()]
-    return jsonify(all_users)
+    limit = request.args.get('limit')
+    after = request.args.get('after')
+    if limit is not None:
+        try:
+            limit = int(limit)
+        except ValueError:
+            limit = 0
+        if limit <= 0:
+            return jsonify({'error': "limit must be a positive integer"}), 400
+    etag = hashlib.sha1('{}:{}:{}'.format(
+        COLLECTION_ETAG_SALT, User.version(),
+        request.query_string.decode()).encode()).hexdigest()
+    if request.args.get('stream') in ('1', 'true'):
+        return _conditional(etag, build=lambda: Response(
+            _stream_users(after, limit), mimetype='application/json'))
+    if limit is None and after is None:
+        return _conditional(etag, build=lambda: jsonify(
+            [user.to_json() for user in User.all()]))
+    return _conditional(etag, build=lambda: _users_page(after, limit))
 
 
 @app_views.route('/users/<user_id>', methods=['GET'], strict_slashes=False)
@@ -23,6 +141,8 @@ def view_one_user(user_id: str = None) -> str:
       - User ID.
     Return:
       - User object JSON represented.
+      - 304 if the User didn't change since the ETag sent in
+        If-None-Match or the date sent in If-Modified-Since.
       - 404 if the User ID doesn't exist.
     """
     if user_id is None:
@@ -31,11 +151,11 @@ def view_one_user(user_id: str = None) -> str:
         if request.current_user is None:
             abort(404)
         else:
-            return jsonify(request.current_user.to_json())
+            return _user_response(request.current_user)
     user = User.get(user_id)
     if user is None:
         abort(404)
-    return jsonify(user.to_json())
+    return _user_response(user)
 
 
 @app_views.route('/users/<user_id>', methods=['DELETE'], strict_slashes=False)
@@ -125,3 +245,109 @@ def update_user(user_id: str = None) -> str:
         user.last_name = rj.get('last_name')
     user.save()
     return jsonify(user.to_json()), 200
+
+
+def _check_operation(op) -> str:
+    """Returns why a batch operation is invalid, None if it is valid.
+    """
+    if type(op) is not dict:
+        return "Wrong format"
+    action = op.get('op')
+    if action not in ('create', 'update', 'delete'):
+        return "op must be create, update or delete"
+    if action == 'create':
+        if op.get('email', "") == "":
+            return "email missing"
+        if type(op.get('email')) is not str:
+            return "email must be a string"
+        if op.get('password', "") == "":
+            return "password missing"
+        if type(op.get('password')) is not str:
+            return "password must be a string"
+    elif type(op.get('id')) is not str:
+        return "id missing"
+    return None
+
+
+@app_views.route('/users/batch', methods=['POST'], strict_slashes=False)
+def batch_users() -> str:
+    """POST /api/v1/users/batch
+    JSON body:
+      - list of up to BATCH_MAX_SIZE operations, each one of:
+        - {"op": "create", "email", "password", "first_name" (optional),
+          "last_name" (optional)}.
+        - {"op": "update", "id", "first_name" (optional),
+          "last_name" (optional)}.
+        - {"op": "delete", "id"}.
+    Return:
+      - list of per-operation results, in order, once all operations
+        are applied and persisted in a single write.
+      - 400 with the errors of the invalid operations if any, in
+        which case none is applied.
+    """
+    rj = None
+    try:
+        rj = request.get_json()
+    except Exception as e:
+        rj = None
+    if type(rj) is not list:
+        return jsonify({'error': "Wrong format"}), 400
+    if len(rj) > BATCH_MAX_SIZE:
+        return jsonify({
+            'error': "Too many operations (max {})".format(BATCH_MAX_SIZE),
+        }), 400
+    errors = []
+    for i, op in enumerate(rj):
+        error_msg = _check_operation(op)
+        if error_msg is not None:
+            errors.append({'index': i, 'error': error_msg})
+    if len(errors) > 0:
+        return jsonify({'error': "Invalid operations", 'results': errors}), 400
+
+    # Hash every password before taking DATA_LOCK, which would
+    # otherwise block all other model writes for the whole batch.
+    creates = [i for i, op in enumerate(rj) if op['op'] == 'create']
+    hashes = dict(zip(creates, list(HASH_EXECUTOR.map(
+        hash_password, [rj[i]['password'] for i in creates]))))
+    with DATA_LOCK:
+        users = {}
+        for i, op in enumerate(rj):
+            if op['op'] != 'create':
+                user = users.get(op['id'], User.get(op['id']))
+                if user is None:
+                    errors.append({'index': i, 'error': "User not found"})
+                users[op['id']] = None if op['op'] == 'delete' else user
+        if len(errors) > 0:
+            return jsonify({
+                'error': "Invalid operations",
+                'results': errors,
+            }), 400
+        results, saved, removed = [], {}, {}
+        for i, op in enumerate(rj):
+            if op['op'] == 'create':
+                user = User(
+                    email=op.get('email'),
+                    _password=hashes[i],
+                    first_name=op.get('first_name'),
+                    last_name=op.get('last_name'),
+                )
+                saved[user.id] = user
+                results.append({'status': 201, 'user': user})
+            elif op['op'] == 'update':
+                user = User.get(op['id'])
+                if op.get('first_name') is not None:
+                    user.first_name = op.get('first_name')
+                if op.get('last_name') is not None:
+                    user.last_name = op.get('last_name')
+                saved[user.id] = user
+                results.append({'status': 200, 'user': user})
+            else:
+                user = User.get(op['id'])
+                saved.pop(user.id, None)
+                removed[user.id] = user
+                results.append({'status': 200, 'id': user.id})
+        User.bulk_write(saved=saved.values(), removed=removed.values())
+    for result in results:
+        if 'user' in result:
+            result['user'] = result['user'].to_json()
+    return jsonify(results), 200
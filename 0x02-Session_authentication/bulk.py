@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+"""Bulk import/export of the file-backed models.
+
+Usage:
+  ./bulk.py export User [-f ndjson|csv] [-o OUTPUT]
+  ./bulk.py import User INPUT [-f ndjson|csv] [-b BATCH] [-w WORKERS]
+
+Records are read and written one at a time, so files of any size go
+through in constant memory besides the models themselves. On import,
+User records with a plain `password` string get it hashed across
+WORKERS processes; records with a `_password` field keep that hash.
+"""
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from typing import Iterable, Iterator
+
+from models.base import STORAGE
+from models.password import hash_password
+from models.user import User
+from models.user_session import UserSession
+
+
+MODELS = {
+    'User': User,
+    'UserSession': UserSession,
+}
+
+
+class Progress:
+    """Reports a record count and throughput on stderr.
+    """
+
+    def __init__(self, label: str) -> None:
+        """Initializes a new Progress instance.
+        """
+        self.label = label
+        self.count = 0
+        self.start = time.monotonic()
+
+    def add(self, count: int) -> None:
+        """Counts processed records and refreshes the report.
+        """
+        self.count += count
+        self.report('\r')
+
+    def report(self, end: str = '\n') -> None:
+        """Prints the record count and throughput.
+        """
+        elapsed = time.monotonic() - self.start
+        rate = self.count / elapsed if elapsed > 0 else 0.0
+        print('\r{}: {} records in {:.1f}s ({:.0f} records/s)'.format(
+            self.label, self.count, elapsed, rate),
+            end=end, file=sys.stderr, flush=True)
+
+
+def read_records(stream, fmt: str) -> Iterator[dict]:
+    """Yields the records of an NDJSON or CSV text stream; empty CSV
+    cells stand for None.
+    """
+    if fmt == 'csv':
+        for row in csv.DictReader(stream):
+            yield {k: (v if v != '' else None) for k, v in row.items()}
+        return
+    for line in stream:
+        line = line.strip()
+        if line:
+            yield json.loads(line)
+
+
+def batches(records: Iterable[dict], size: int) -> Iterator[list]:
+    """Groups records into lists of at most `size` records.
+    """
+    records = iter(records)
+    while True:
+        batch = list(islice(records, size))
+        if len(batch) == 0:
+            return
+        yield batch
+
+
+def import_records(cls: type, records: Iterable[dict], batch_size: int,
+                   workers: int, progress: Progress) -> None:
+    """Saves records as objects of a model, one batch at a time.
+
+    Records keep their `created_at`/`updated_at`, if any. With an
+    incremental storage each batch is appended as it goes, otherwise
+    the whole file is written once at the end.
+    """
+    persist = STORAGE.incremental
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for batch in batches(records, batch_size):
+            plain = [r for r in batch if type(r.get('password')) is str]
+            if cls is User and len(plain) > 0:
+                hashes = executor.map(
+                    hash_password, [r.pop('password') for r in plain],
+                    chunksize=max(1, len(plain) // (workers * 4)),
+                )
+                for record, hashed in zip(plain, hashes):
+                    record['_password'] = hashed
+            cls.bulk_write(saved=[cls(**record) for record in batch],
+                           persist=persist, touch=False)
+            progress.add(len(batch))
+    if not persist:
+        cls.save_to_file()
+
+
+def export_records(cls: type, page_size: int = 1000) -> Iterator[dict]:
+    """Yields the stored objects of a model, ordered by ID.
+    """
+    after = None
+    while True:
+        objs = cls.page(after=after, limit=page_size)
+        if len(objs) == 0:
+            return
+        for obj in objs:
+            yield obj.to_json(True)
+        after = objs[-1].id
+
+
+def write_records(records: Iterable[dict], output, fmt: str,
+                  progress: Progress) -> None:
+    """Writes records to a text stream as NDJSON or CSV.
+    """
+    writer = None
+    for record in records:
+        if fmt == 'csv':
+            if writer is None:
+                writer = csv.DictWriter(output, fieldnames=list(record),
+                                        extrasaction='ignore')
+                writer.writeheader()
+            writer.writerow(record)
+        else:
+            output.write(json.dumps(record) + '\n')
+        progress.count += 1
+        if progress.count % 10000 == 0:
+            progress.add(0)
+
+
+def main() -> None:
+    """Parses the command line and runs the import or export.
+    """
+    parser = argparse.ArgumentParser(
+        description="Bulk import/export of the file-backed models.")
+    commands = parser.add_subparsers(dest='command', required=True)
+    export_parser = commands.add_parser('export')
+    export_parser.add_argument('model', choices=sorted(MODELS))
+    export_parser.add_argument('-o', '--output',
+                               help="output file (default: standard output)")
+    import_parser = commands.add_parser('import')
+    import_parser.add_argument('model', choices=sorted(MODELS))
+    import_parser.add_argument('input', help="file to import, - for stdin")
+    import_parser.add_argument('-b', '--batch-size', type=int, default=1000)
+    import_parser.add_argument('-w', '--workers', type=int,
+                               default=os.cpu_count() or 1)
+    for command_parser in (export_parser, import_parser):
+        command_parser.add_argument('-f', '--format', default='ndjson',
+                                    choices=('ndjson', 'csv'))
+    options = parser.parse_args()
+
+    cls = MODELS[options.model]
+    cls.load_from_file()
+    progress = Progress(options.model)
+    if options.command == 'export':
+        output = sys.stdout
+        if options.output is not None:
+            output = open(options.output, 'w', newline='')
+        try:
+            write_records(export_records(cls), output, options.format,
+                          progress)
+        finally:
+            if options.output is not None:
+                output.close()
+            else:
+                output.flush()
+    else:
+        stream = sys.stdin
+        if options.input != '-':
+            stream = open(options.input, newline='')
+        try:
+            import_records(cls, read_records(stream, options.format),
+                           max(options.batch_size, 1),
+                           max(options.workers, 1), progress)
+        finally:
+            if options.input != '-':
+                stream.close()
+    progress.report()
+
+
+if __name__ == '__main__':
+    main()
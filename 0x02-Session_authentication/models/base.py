@@ -1,20 +1,311 @@
 #!/usr/bin/env python3
 """ Base module
 """
+from bisect import bisect_left, bisect_right
 from datetime import datetime
-from typing import TypeVar, List, Iterable
-from os import path
-import json
+from typing import Dict, Optional, TypeVar, List, Iterable
+import atexit
+import itertools
+import logging
+import os
+import threading
 import uuid
 
+from models.storage import storage_from_env
+
 
 TIMESTAMP_FORMAT = "%Y-%m-%dT%H:%M:%S"
 DATA = {}
+INDEXES = {}
+VERSIONS = {}
+DATA_LOCK = threading.RLock()
+_VERSION_COUNTER = itertools.count(1)
+STORAGE = storage_from_env()
+
+
+class SortedIds():
+    """ Sorted set of IDs kept as a list of short sorted lists, so that
+    adding or discarding one ID moves at most about 2 * `load` IDs
+    instead of shifting one list of every ID
+    """
+
+    def __init__(self, ids: Iterable[str] = (), load: int = 1000):
+        """ Initialize a SortedIds instance
+        """
+        self.load = load
+        self._reset(sorted(set(ids)))
+
+    def _reset(self, ids: List[str]) -> None:
+        """ Replace the content by sorted, distinct IDs
+        """
+        self._lists = [
+            ids[i:i + self.load] for i in range(0, len(ids), self.load)
+        ]
+        self._maxes = [sub[-1] for sub in self._lists]
+        self._len = len(ids)
+
+    def __len__(self) -> int:
+        """ Number of IDs
+        """
+        return self._len
+
+    def __iter__(self):
+        """ Iterate over the IDs in order
+        """
+        return itertools.chain.from_iterable(self._lists)
+
+    def add(self, obj_id: str) -> None:
+        """ Insert an ID unless already present
+        """
+        if len(self._lists) == 0:
+            self._reset([obj_id])
+            return
+        i = min(bisect_left(self._maxes, obj_id), len(self._maxes) - 1)
+        sub = self._lists[i]
+        j = bisect_left(sub, obj_id)
+        if j < len(sub) and sub[j] == obj_id:
+            return
+        sub.insert(j, obj_id)
+        self._maxes[i] = sub[-1]
+        self._len += 1
+        if len(sub) > 2 * self.load:
+            self._lists[i:i + 1] = [sub[:self.load], sub[self.load:]]
+            self._maxes[i:i + 1] = [sub[self.load - 1], sub[-1]]
+
+    def update(self, ids: Iterable[str]) -> None:
+        """ Insert many IDs: one at a time for a few, otherwise by
+        sorting them once together with the current ones
+        """
+        ids = list(ids)
+        if len(ids) <= self.load:
+            for obj_id in ids:
+                self.add(obj_id)
+            return
+        merged = sorted(itertools.chain(self, ids))
+        self._reset([
+            obj_id for i, obj_id in enumerate(merged)
+            if i == 0 or merged[i - 1] != obj_id
+        ])
+
+    def discard(self, obj_id: str) -> None:
+        """ Remove an ID if present
+        """
+        i = bisect_left(self._maxes, obj_id)
+        if i == len(self._maxes):
+            return
+        sub = self._lists[i]
+        j = bisect_left(sub, obj_id)
+        if j == len(sub) or sub[j] != obj_id:
+            return
+        del sub[j]
+        self._len -= 1
+        if len(sub) == 0:
+            del self._lists[i]
+            del self._maxes[i]
+        else:
+            self._maxes[i] = sub[-1]
+
+    def after(self, obj_id: Optional[str], limit: int) -> List[str]:
+        """ Return up to `limit` IDs following `obj_id` (from the first
+        one if None)
+        """
+        i, j = 0, 0
+        if obj_id is not None:
+            i = bisect_right(self._maxes, obj_id)
+            if i < len(self._lists):
+                j = bisect_right(self._lists[i], obj_id)
+        result = []
+        while i < len(self._lists) and len(result) < limit:
+            result.extend(self._lists[i][j:j + limit - len(result)])
+            i, j = i + 1, 0
+        return result
+
+
+def _index_add(s_class: str, obj: TypeVar('Base'),
+               add_id: bool = True) -> bool:
+    """ Register an object in the attribute indexes of its class and,
+    unless `add_id` is False, in its sorted IDs; return True if the
+    object wasn't indexed yet
+    """
+    indexes = INDEXES.get(s_class)
+    if indexes is None:
+        return False
+    keys = indexes['keys']
+    is_new = keys.get(obj.id) is None
+    if not is_new:
+        _index_discard(s_class, obj.id, keep_id=True)
+    elif add_id:
+        indexes['ids'].add(obj.id)
+    obj_keys = {}
+    for attr, buckets in indexes['attrs'].items():
+        value = getattr(obj, attr, None)
+        try:
+            buckets.setdefault(value, {})[obj.id] = obj
+        except TypeError:
+            continue
+        obj_keys[attr] = value
+    keys[obj.id] = obj_keys
+    return is_new
+
+
+def _index_discard(s_class: str, obj_id: str, keep_id: bool = False) -> None:
+    """ Unregister an object from the attribute indexes of its class
+    and, unless `keep_id` is True, from its sorted IDs
+    """
+    indexes = INDEXES.get(s_class)
+    if indexes is None:
+        return
+    obj_keys = indexes['keys'].pop(obj_id, None)
+    if obj_keys is None:
+        return
+    if not keep_id:
+        indexes['ids'].discard(obj_id)
+    for attr, value in obj_keys.items():
+        bucket = indexes['attrs'][attr].get(value)
+        if bucket is None:
+            continue
+        bucket.pop(obj_id, None)
+        if len(bucket) == 0:
+            del indexes['attrs'][attr][value]
+
+
+def _bump_version(s_class: str) -> None:
+    """ Record that the objects of a class changed
+    """
+    VERSIONS[s_class] = next(_VERSION_COUNTER)
+
+
+def _index_rebuild(s_class: str, attributes: Iterable[str]) -> None:
+    """ (Re)build the attribute indexes and the sorted ids of a class
+    from DATA
+    """
+    objs = DATA.get(s_class, {})
+    INDEXES[s_class] = {
+        'attrs': {attr: {} for attr in attributes},
+        'keys': {},
+        'ids': SortedIds(objs),
+    }
+    for obj in objs.values():
+        _index_add(s_class, obj, add_id=False)
+
+
+class WriteBehind():
+    """ Write-behind buffer: save()/remove() only mark objects dirty,
+    a background thread persists them in batches every `interval`
+    seconds or as soon as `threshold` objects are dirty, so that many
+    writes share one storage write and one fsync.
+    """
+
+    def __init__(self, interval: float, threshold: int):
+        """ Initialize a WriteBehind instance and start its thread
+        """
+        self.interval = interval
+        self.threshold = max(threshold, 1)
+        self.__pending = {}
+        self.__dirty_count = 0
+        self.__cond = threading.Condition()
+        self.__flush_lock = threading.Lock()
+        self.__thread = threading.Thread(target=self._run, daemon=True)
+        self.__thread.start()
+
+    def mark(self, cls: type, objs: Dict[str, Optional['Base']]) -> None:
+        """ Queue objects of a class, None standing for a removal
+        """
+        with self.__cond:
+            pending = self.__pending.setdefault(cls.__name__, (cls, {}))[1]
+            for obj_id, obj in objs.items():
+                if obj_id not in pending:
+                    self.__dirty_count += 1
+                pending[obj_id] = obj
+            if self.__dirty_count >= self.threshold:
+                self.__cond.notify()
+
+    def flush(self) -> None:
+        """ Ask the background thread to write the pending objects now
+        """
+        with self.__cond:
+            self.__cond.notify()
+
+    def sync(self) -> None:
+        """ Write the pending objects and return once they are stored
+        """
+        with self.__flush_lock:
+            with self.__cond:
+                batches = list(self.__pending.values())
+                self.__pending = {}
+                self.__dirty_count = 0
+            for i, (cls, objs) in enumerate(batches):
+                try:
+                    cls._write(objs)
+                except Exception:
+                    self._requeue(batches[i:])
+                    raise
+
+    def _requeue(self, batches: list) -> None:
+        """ Put back batches that could not be written, keeping any
+        newer state queued for the same objects in the meantime
+        """
+        with self.__cond:
+            for cls, objs in batches:
+                pending = self.__pending.setdefault(
+                    cls.__name__, (cls, {}))[1]
+                for obj_id, obj in objs.items():
+                    if obj_id not in pending:
+                        self.__dirty_count += 1
+                        pending[obj_id] = obj
+
+    def _run(self) -> None:
+        """ Background loop of the writer thread
+        """
+        while True:
+            with self.__cond:
+                if self.__dirty_count < self.threshold:
+                    self.__cond.wait(self.interval)
+            try:
+                self.sync()
+            except Exception:
+                logging.getLogger(__name__).exception(
+                    "Write-behind flush failed, will retry in %ss",
+                    self.interval)
+
+
+def _write_behind_from_env() -> Optional[WriteBehind]:
+    """ Build the write-behind buffer selected by MODELS_FLUSH_INTERVAL
+    """
+    try:
+        interval = float(os.getenv('MODELS_FLUSH_INTERVAL', '0'))
+        threshold = int(os.getenv('MODELS_FLUSH_THRESHOLD', '100'))
+    except ValueError:
+        return None
+    if interval <= 0:
+        return None
+    return WriteBehind(interval, threshold)
+
+
+WRITE_BEHIND = _write_behind_from_env()
+
+
+def flush() -> None:
+    """ Start writing the pending objects without waiting
+    """
+    if WRITE_BEHIND is not None:
+        WRITE_BEHIND.flush()
+
+
+def sync() -> None:
+    """ Write the pending objects and wait until they are stored
+    """
+    if WRITE_BEHIND is not None:
+        WRITE_BEHIND.sync()
+
+
+atexit.register(sync)
 
 
 class Base():
     """ Base class
     """
+    indexed_attributes = ()
 
     def __init__(self, *args: list, **kwargs: dict):
         """ Initialize a Base instance
@@ -22,6 +313,8 @@ class Base():
         s_class = str(self.__class__.__name__)
         if DATA.get(s_class) is None:
             DATA[s_class] = {}
+        if INDEXES.get(s_class) is None:
+            _index_rebuild(s_class, self.__class__.indexed_attributes)
 
         self.id = kwargs.get('id', str(uuid.uuid4()))
         if kwargs.get('created_at') is not None:
@@ -62,44 +355,98 @@ class Base():
         """ Load all objects from file
         """
         s_class = cls.__name__
-        file_path = ".db_{}.json".format(s_class)
-        DATA[s_class] = {}
-        if not path.exists(file_path):
-            return
-
-        with open(file_path, 'r') as f:
-            objs_json = json.load(f)
-            for obj_id, obj_json in objs_json.items():
-                DATA[s_class][obj_id] = cls(**obj_json)
+        sync()
+        objs = {}
+        for obj_id, obj_json in STORAGE.load(s_class).items():
+            objs[obj_id] = cls(**obj_json)
+        with DATA_LOCK:
+            DATA[s_class] = objs
+            _index_rebuild(s_class, cls.indexed_attributes)
+            _bump_version(s_class)
 
     @classmethod
     def save_to_file(cls):
         """ Save all objects to file
         """
         s_class = cls.__name__
-        file_path = ".db_{}.json".format(s_class)
         objs_json = {}
-        for obj_id, obj in DATA[s_class].items():
+        for obj_id, obj in list(DATA[s_class].items()):
             objs_json[obj_id] = obj.to_json(True)
+        STORAGE.dump(s_class, objs_json)
 
-        with open(file_path, 'w') as f:
-            json.dump(objs_json, f)
+    @classmethod
+    def _write(cls, objs: Dict[str, Optional['Base']]):
+        """ Store saved objects, None standing for a removal, as journal
+        entries when the storage backend supports it, as a whole-file
+        rewrite otherwise
+        """
+        if STORAGE.incremental:
+            STORAGE.append(cls.__name__, [
+                (obj_id, None if obj is None else obj.to_json(True))
+                for obj_id, obj in objs.items()
+            ])
+        else:
+            cls.save_to_file()
+
+    @classmethod
+    def _persist(cls, objs: Dict[str, Optional['Base']]):
+        """ Persist saved/removed objects now or through write-behind
+        """
+        if WRITE_BEHIND is not None:
+            WRITE_BEHIND.mark(cls, objs)
+        else:
+            cls._write(objs)
 
     def save(self):
         """ Save current object
         """
-        s_class = self.__class__.__name__
-        self.updated_at = datetime.utcnow()
-        DATA[s_class][self.id] = self
-        self.__class__.save_to_file()
+        self.__class__.bulk_write(saved=[self])
 
     def remove(self):
         """ Remove object
         """
-        s_class = self.__class__.__name__
-        if DATA[s_class].get(self.id) is not None:
-            del DATA[s_class][self.id]
-            self.__class__.save_to_file()
+        self.__class__.bulk_write(removed=[self])
+
+    @classmethod
+    def bulk_write(cls, saved: Iterable['Base'] = (),
+                   removed: Iterable['Base'] = (),
+                   persist: bool = True, touch: bool = True) -> None:
+        """ Save and remove many objects of the class at once, under
+        DATA_LOCK, persisting them all in a single storage write
+        (left to a later save_to_file if `persist` is False); saved
+        objects keep their `updated_at` if `touch` is False
+        """
+        s_class = cls.__name__
+        objs = {}
+        with DATA_LOCK:
+            now = datetime.utcnow()
+            new_ids = []
+            for obj in saved:
+                if touch:
+                    obj.updated_at = now
+                DATA[s_class][obj.id] = obj
+                if _index_add(s_class, obj, add_id=False):
+                    new_ids.append(obj.id)
+                objs[obj.id] = obj
+            if len(new_ids) > 0:
+                INDEXES[s_class]['ids'].update(new_ids)
+            for obj in removed:
+                if DATA[s_class].get(obj.id) is not None:
+                    del DATA[s_class][obj.id]
+                    _index_discard(s_class, obj.id)
+                    objs[obj.id] = None
+            if len(objs) == 0:
+                return
+            _bump_version(s_class)
+            if persist:
+                cls._persist(objs)
+
+    @classmethod
+    def version(cls) -> int:
+        """ Return a number that changes whenever an object of the class
+        is saved or removed
+        """
+        return VERSIONS.get(cls.__name__, 0)
 
     @classmethod
     def count(cls) -> int:
@@ -114,6 +461,22 @@ class Base():
         """
         return cls.search()
 
+    @classmethod
+    def page(cls, after: Optional[str] = None,
+             limit: int = 100) -> List[TypeVar('Base')]:
+        """ Return up to `limit` objects ordered by ID, starting right
+        after the ID `after` (from the first object if None)
+        """
+        s_class = cls.__name__
+        with DATA_LOCK:
+            indexes = INDEXES.get(s_class)
+            if indexes is None:
+                _index_rebuild(s_class, cls.indexed_attributes)
+                indexes = INDEXES[s_class]
+            objs = DATA.get(s_class, {})
+            return [objs[obj_id] for obj_id in indexes['ids'].after(
+                after, limit) if obj_id in objs]
+
     @classmethod
     def get(cls, id: str) -> TypeVar('Base'):
         """ Return one object by ID
@@ -124,8 +487,25 @@ class Base():
     @classmethod
     def search(cls, attributes: dict = {}) -> List[TypeVar('Base')]:
         """ Search all objects with matching attributes
+
+        Equality on an attribute listed in `indexed_attributes` is
+        resolved through the class index, the other attributes are
+        then checked on the (usually tiny) candidate set.
         """
         s_class = cls.__name__
+        candidates = DATA[s_class].values()
+        indexes = INDEXES.get(s_class)
+        if indexes is not None:
+            for k, v in attributes.items():
+                buckets = indexes['attrs'].get(k)
+                if buckets is None:
+                    continue
+                try:
+                    candidates = buckets.get(v, {}).values()
+                except TypeError:
+                    continue
+                break
+
         def _search(obj):
             if len(attributes) == 0:
                 return True
@@ -133,5 +513,5 @@ class Base():
                 if (getattr(obj, k) != v):
                     return False
             return True
-        
-        return list(filter(_search, DATA[s_class].values()))
+
+        return list(filter(_search, candidates))
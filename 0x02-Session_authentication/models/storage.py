@@ -0,0 +1,221 @@
+#!/usr/bin/env python3
+""" Storage backends module
+"""
+import json
+import os
+import tempfile
+import threading
+from typing import Dict, List, Optional, Tuple
+
+
+Record = Tuple[str, Optional[dict]]
+
+
+def _fsync_dir(dir_path: str) -> None:
+    """ Flush a directory entry so that a rename survives a crash
+    """
+    try:
+        fd = os.open(dir_path, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def _atomic_dump(file_path: str, objs_json: Dict[str, dict]) -> None:
+    """ Write a JSON document through a temporary file and a rename,
+    so readers see either the old or the new content, never a torn one;
+    each write gets its own temporary file, so concurrent writers never
+    share one
+    """
+    dir_path = os.path.dirname(os.path.abspath(file_path))
+    fd, tmp_path = tempfile.mkstemp(
+        dir=dir_path, prefix="{}.".format(os.path.basename(file_path)),
+        suffix=".tmp")
+    try:
+        try:
+            mode = os.stat(file_path).st_mode & 0o777
+        except OSError:
+            mode = 0o644
+        os.fchmod(fd, mode)
+        with os.fdopen(fd, 'w') as f:
+            json.dump(objs_json, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, file_path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+    _fsync_dir(dir_path)
+
+
+class FileStorage():
+    """ Whole-file JSON storage: every write rewrites `.db_<Class>.json`
+
+    A `.db_<Class>.journal` left over by JournalStorage is replayed on
+    load and folded into the snapshot on the next write, so switching
+    MODELS_STORAGE back to `file` neither drops nor resurrects objects.
+    """
+    incremental = False
+
+    def file_path(self, s_class: str) -> str:
+        """ Path of the snapshot file of a class
+        """
+        return ".db_{}.json".format(s_class)
+
+    def journal_path(self, s_class: str) -> str:
+        """ Path of the journal file of a class
+        """
+        return ".db_{}.journal".format(s_class)
+
+    def load(self, s_class: str) -> Dict[str, dict]:
+        """ Return the serialized objects of a class, with any journal
+        replayed
+        """
+        objs_json = {}
+        file_path = self.file_path(s_class)
+        if os.path.exists(file_path):
+            with open(file_path, 'r') as f:
+                objs_json = json.load(f)
+        self._replay_journal(s_class, objs_json)
+        return objs_json
+
+    def dump(self, s_class: str, objs_json: Dict[str, dict]) -> None:
+        """ Replace the serialized objects of a class and reset its
+        journal
+        """
+        _atomic_dump(self.file_path(s_class), objs_json)
+        journal_path = self.journal_path(s_class)
+        if os.path.exists(journal_path):
+            with open(journal_path, 'r+b') as f:
+                f.truncate(0)
+                f.flush()
+                os.fsync(f.fileno())
+
+    def _replay_journal(self, s_class: str,
+                        objs_json: Dict[str, dict]) -> None:
+        """ Apply the journal records of a class to its snapshot and
+        drop a torn last line
+        """
+        journal_path = self.journal_path(s_class)
+        if not os.path.exists(journal_path):
+            return
+        valid_size = 0
+        with open(journal_path, 'rb') as f:
+            for line in f:
+                if not line.endswith(b'\n'):
+                    break
+                try:
+                    record = json.loads(line.decode('utf-8'))
+                except ValueError:
+                    break
+                valid_size += len(line)
+                if record.get('obj') is None:
+                    objs_json.pop(record.get('id'), None)
+                else:
+                    objs_json[record['id']] = record['obj']
+        if valid_size < os.path.getsize(journal_path):
+            with open(journal_path, 'r+b') as f:
+                f.truncate(valid_size)
+
+
+class JournalStorage(FileStorage):
+    """ Append-only storage: `.db_<Class>.json` holds a snapshot and
+    `.db_<Class>.journal` the put/delete records written since.
+
+    A record is one JSON line, `{"id": ..., "obj": {...}}` for a put
+    and `{"id": ..., "obj": null}` for a delete. Replaying a record
+    twice is harmless, so a crash between writing a new snapshot and
+    truncating the journal loses nothing; a torn last line is dropped.
+    """
+    incremental = True
+
+    def __init__(self, max_journal_size: int = 1 << 20):
+        """ Initialize a JournalStorage instance
+        """
+        self.max_journal_size = max_journal_size
+        self.__locks = {}
+        self.__locks_lock = threading.Lock()
+        self.__compacting = set()
+
+    def _lock(self, s_class: str) -> threading.RLock:
+        """ Lock serializing the writes of a class
+        """
+        with self.__locks_lock:
+            lock = self.__locks.get(s_class)
+            if lock is None:
+                lock = threading.RLock()
+                self.__locks[s_class] = lock
+            return lock
+
+    def load(self, s_class: str) -> Dict[str, dict]:
+        """ Return the snapshot of a class with its journal replayed
+        """
+        with self._lock(s_class):
+            return super().load(s_class)
+
+    def dump(self, s_class: str, objs_json: Dict[str, dict]) -> None:
+        """ Write a new snapshot of a class and reset its journal
+        """
+        with self._lock(s_class):
+            super().dump(s_class, objs_json)
+
+    def append(self, s_class: str, records: List[Record]) -> None:
+        """ Append put/delete records to the journal with a single fsync
+        """
+        if len(records) == 0:
+            return
+        lines = [
+            json.dumps({'id': obj_id, 'obj': obj_json}) + '\n'
+            for obj_id, obj_json in records
+        ]
+        with self._lock(s_class):
+            with open(self.journal_path(s_class), 'ab') as f:
+                f.write(''.join(lines).encode('utf-8'))
+                f.flush()
+                os.fsync(f.fileno())
+                size = f.tell()
+        if size > self.max_journal_size:
+            self.compact_in_background(s_class)
+
+    def compact(self, s_class: str) -> None:
+        """ Fold the journal of a class into its snapshot
+        """
+        with self._lock(s_class):
+            self.dump(s_class, self.load(s_class))
+
+    def compact_in_background(self, s_class: str) -> None:
+        """ Start a compaction thread unless one already runs for a class
+        """
+        with self.__locks_lock:
+            if s_class in self.__compacting:
+                return
+            self.__compacting.add(s_class)
+
+        def _run():
+            try:
+                self.compact(s_class)
+            finally:
+                with self.__locks_lock:
+                    self.__compacting.discard(s_class)
+
+        threading.Thread(target=_run, daemon=True).start()
+
+
+def storage_from_env() -> FileStorage:
+    """ Build the storage backend selected by MODELS_STORAGE
+    """
+    if os.getenv('MODELS_STORAGE', 'file') == 'journal':
+        try:
+            max_size = int(os.getenv('MODELS_JOURNAL_MAX_SIZE', '1048576'))
+        except ValueError:
+            max_size = 1 << 20
+        return JournalStorage(max_size)
+    return FileStorage()
@@ -1,13 +1,14 @@
 #!/usr/bin/env python3
 """User module.
 """
-import hashlib
 from models.base import Base
+from models.password import hash_password, needs_rehash, verify_password
 
 
 class User(Base):
     """User class.
     """
+    indexed_attributes = ('email',)
 
     def __init__(self, *args: list, **kwargs: dict):
         """Initialize a User instance.
@@ -26,25 +27,32 @@ class User(Base):
 
     @password.setter
     def password(self, pwd: str):
-        """Setter of a new password: encrypt in SHA256.
-
-        WARNING: Use a better password hashing algorithm like argon2
-        or bcrypt in real-world projects.
+        """Setter of a new password: hash it with the default
+        scheme of models.password.
         """
         if pwd is None or type(pwd) is not str:
             self._password = None
         else:
-            self._password = hashlib.sha256(pwd.encode()).hexdigest().lower()
+            self._password = hash_password(pwd)
 
     def is_valid_password(self, pwd: str) -> bool:
         """Validate a password.
+
+        A password stored with another scheme or outdated cost
+        parameters than the default ones is rehashed on success, and
+        the user saved if it is stored.
         """
         if pwd is None or type(pwd) is not str:
             return False
         if self.password is None:
             return False
-        pwd_e = pwd.encode()
-        return hashlib.sha256(pwd_e).hexdigest().lower() == self.password
+        if not verify_password(pwd, self.password):
+            return False
+        if needs_rehash(self.password):
+            self.password = pwd
+            if User.get(self.id) is self:
+                self.save()
+        return True
 
     def display_name(self) -> str:
         """Display User name based on email/first_name/last_name.
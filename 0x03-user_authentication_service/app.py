@@ -4,12 +4,29 @@
 from flask import Flask, jsonify, request, abort, redirect
 
 from auth import Auth
+from password_hasher import HasherBusyError
 
 
 app = Flask(__name__)
 AUTH = Auth()
 
 
+@app.errorhandler(HasherBusyError)
+def hasher_busy(error) -> str:
+    """Password hasher saturated handler.
+    """
+    response = jsonify({"message": "service unavailable"})
+    response.headers["Retry-After"] = "1"
+    return response, 503
+
+
+@app.teardown_appcontext
+def remove_db_session(exception=None) -> None:
+    """Releases the database session of the request.
+    """
+    AUTH.remove_db_session()
+
+
 @app.route("/", methods=["GET"], strict_slashes=False)
 def index() -> str:
     """GET /
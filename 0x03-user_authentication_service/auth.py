@@ -1,19 +1,20 @@
 #!/usr/bin/env python3
 """A module for authentication-related routines.
 """
-import bcrypt
 from uuid import uuid4
 from typing import Union
 from sqlalchemy.orm.exc import NoResultFound
 
 from db import DB
+from password_hasher import HasherBusyError, get_hasher
+from session_cache import UserSnapshot, session_cache_from_env
 from user import User
 
 
 def _hash_password(password: str) -> bytes:
-    """Hashes a password.
+    """Hashes a password on the bcrypt worker pool.
     """
-    return bcrypt.hashpw(password.encode("utf-8"), bcrypt.gensalt())
+    return get_hasher().hash(password).result()
 
 
 def _generate_uuid() -> str:
@@ -30,6 +31,12 @@ class Auth:
         """Initializes a new Auth instance.
         """
         self._db = DB()
+        self._session_cache = session_cache_from_env()
+
+    def remove_db_session(self) -> None:
+        """Releases the database session of the current thread.
+        """
+        self._db.remove_session()
 
     def register_user(self, email: str, password: str) -> User:
         """Adds a new user to the database.
@@ -42,44 +49,68 @@ class Auth:
 
     def valid_login(self, email: str, password: str) -> bool:
         """Checks if a user's login details are valid.
+
+        A valid password whose hash uses an outdated bcrypt cost is
+        rehashed with the current one and stored.
         """
         user = None
         try:
             user = self._db.find_user_by(email=email)
             if user is not None:
-                return bcrypt.checkpw(
-                    password.encode("utf-8"),
+                hasher = get_hasher()
+                is_valid = hasher.verify(
+                    password,
                     user.hashed_password,
-                )
+                ).result()
+                if is_valid and hasher.needs_rehash(user.hashed_password):
+                    self._rehash_password(user.id, password)
+                return is_valid
         except NoResultFound:
             return False
         return False
 
+    def _rehash_password(self, user_id: int, password: str) -> None:
+        """Stores a new hash of a user's password, made with the
+        current bcrypt cost. Skipped if the hasher is saturated.
+        """
+        try:
+            new_password_hash = _hash_password(password)
+        except HasherBusyError:
+            return
+        self._db.update_user(user_id, hashed_password=new_password_hash)
+
     def create_session(self, email: str) -> str:
         """Creates a new session for a user.
         """
-        user = None
-        try:
-            user = self._db.find_user_by(email=email)
-        except NoResultFound:
-            return None
-        if user is None:
-            return None
         session_id = _generate_uuid()
-        self._db.update_user(user.id, session_id=session_id)
+        if self._db.update_user_by({"session_id": session_id},
+                                   email=email) == 0:
+            return None
+        self._session_cache.invalidate_email(email)
         return session_id
 
-    def get_user_from_session_id(self, session_id: str) -> Union[User, None]:
-        """Retrieves a user based on a given session ID.
+    def get_user_from_session_id(
+            self, session_id: str) -> Union[UserSnapshot, None]:
+        """Retrieves a snapshot of the user owning a given session ID,
+        from the session cache when possible.
         """
         user = None
         if session_id is None:
             return None
+        user = self._session_cache.get(session_id)
+        if user is not None:
+            return user
+        generation = self._session_cache.generation()
         try:
             user = self._db.find_user_by(session_id=session_id)
         except NoResultFound:
             return None
-        return user
+        return self._session_cache.put(session_id, user, generation)
+
+    def session_cache_stats(self) -> dict:
+        """Returns the size and hit/miss counters of the session cache.
+        """
+        return self._session_cache.stats()
 
     def destroy_session(self, user_id: int) -> None:
         """Destroys a session associated with a given user.
@@ -87,19 +118,15 @@ class Auth:
         if user_id is None:
             return None
         self._db.update_user(user_id, session_id=None)
+        self._session_cache.invalidate_user(user_id)
 
     def get_reset_password_token(self, email: str) -> str:
         """Generates a password reset token for a user.
         """
-        user = None
-        try:
-            user = self._db.find_user_by(email=email)
-        except NoResultFound:
-            user = None
-        if user is None:
-            raise ValueError()
         reset_token = _generate_uuid()
-        self._db.update_user(user.id, reset_token=reset_token)
+        if self._db.update_user_by({"reset_token": reset_token},
+                                   email=email) == 0:
+            raise ValueError()
         return reset_token
 
     def update_password(self, reset_token: str, password: str) -> None:
@@ -118,3 +145,4 @@ class Auth:
             hashed_password=new_password_hash,
             reset_token=None,
         )
+        self._session_cache.invalidate_user(user.id)
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""Benchmark of user lookups with and without the `users` indexes.
+
+Usage: ./bench_lookup.py [USERS] [LOOKUPS]
+Defaults to 1,000,000 users and 200 lookups per column.
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+from uuid import uuid4
+
+from sqlalchemy import Column, MetaData, Table, create_engine, select
+
+from db import ensure_indexes
+from user import User
+
+
+COLUMNS = ("email", "session_id", "reset_token")
+
+
+def _unindexed_table() -> Table:
+    """Returns a copy of the `users` table without its indexes.
+    """
+    return Table(
+        User.__tablename__,
+        MetaData(),
+        *[
+            Column(c.name, c.type, primary_key=c.primary_key,
+                   nullable=c.nullable)
+            for c in User.__table__.columns
+        ],
+    )
+
+
+def populate(engine, table: Table, count: int,
+             batch_size: int = 50000) -> list:
+    """Inserts `count` users and returns a sample of their rows.
+    """
+    sample = []
+    with engine.begin() as conn:
+        for start in range(0, count, batch_size):
+            rows = [
+                {
+                    "email": "user{}@example.com".format(i),
+                    "hashed_password": "x",
+                    "session_id": str(uuid4()),
+                    "reset_token": str(uuid4()),
+                }
+                for i in range(start, min(start + batch_size, count))
+            ]
+            conn.execute(table.insert(), rows)
+            sample.extend(random.sample(rows, min(len(rows), 20)))
+    return sample
+
+
+def time_lookups(engine, table: Table, column: str, values: list) -> float:
+    """Returns the mean lookup latency, in milliseconds, on a column.
+    """
+    with engine.connect() as conn:
+        start = time.perf_counter()
+        for value in values:
+            query = select([table.c.id]).where(table.c[column] == value)
+            conn.execute(query).first()
+        return (time.perf_counter() - start) * 1000 / len(values)
+
+
+def run(engine, count: int, lookups: int) -> tuple:
+    """Returns the mean latency per column before and after indexing.
+    """
+    table = _unindexed_table()
+    table.create(engine)
+    print("Inserting {} users...".format(count))
+    sample = populate(engine, table, count)
+    values = {
+        column: [random.choice(sample)[column] for _ in range(lookups)]
+        for column in COLUMNS
+    }
+    before = {
+        column: time_lookups(engine, table, column, values[column])
+        for column in COLUMNS
+    }
+    start = time.perf_counter()
+    ensure_indexes(engine)
+    print("Indexes created in {:.1f}s".format(time.perf_counter() - start))
+    after = {
+        column: time_lookups(engine, table, column, values[column])
+        for column in COLUMNS
+    }
+    return before, after
+
+
+def main() -> None:
+    """Runs the benchmark and prints the mean latency per column.
+    """
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    lookups = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        engine = create_engine(
+            "sqlite:///{}".format(os.path.join(tmp_dir, "bench.db")))
+        try:
+            before, after = run(engine, count, lookups)
+        finally:
+            engine.dispose()
+    print("{:<12} {:>14} {:>14}".format("column", "before (ms)", "after (ms)"))
+    for column in COLUMNS:
+        print("{:<12} {:>14.3f} {:>14.3f}".format(
+            column, before[column], after[column]))
+
+
+if __name__ == "__main__":
+    main()
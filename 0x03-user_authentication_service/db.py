@@ -1,36 +1,139 @@
 #!/usr/bin/env python3
 """DB module.
 """
-from sqlalchemy import create_engine, tuple_
+import os
+from sqlalchemy import (Column, Integer, MetaData, Table, create_engine,
+                        event, inspect, select, tuple_)
 from sqlalchemy.exc import InvalidRequestError
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import scoped_session, sessionmaker
 from sqlalchemy.orm.exc import NoResultFound
 from sqlalchemy.orm.session import Session
+from sqlalchemy.pool import QueuePool
 
 from user import Base, User
 
 
+# Mapped attributes of the `users` columns, by column name.
+USER_COLUMNS = {
+    column.key: getattr(User, column.key) for column in User.__table__.columns
+}
+
+
+def _engine_options(url: str) -> dict:
+    """Engine pool options read from the environment.
+
+    DB_POOL_SIZE switches to a QueuePool of that size, tuned by
+    DB_MAX_OVERFLOW, DB_POOL_TIMEOUT and DB_POOL_RECYCLE (seconds).
+    """
+    options = {}
+    pool_size = os.getenv("DB_POOL_SIZE")
+    if pool_size is not None:
+        options.update(
+            poolclass=QueuePool,
+            pool_size=int(pool_size),
+            max_overflow=int(os.getenv("DB_MAX_OVERFLOW", "10")),
+            pool_timeout=float(os.getenv("DB_POOL_TIMEOUT", "30")),
+            pool_recycle=int(os.getenv("DB_POOL_RECYCLE", "-1")),
+            pool_pre_ping=True,
+        )
+        if url.startswith("sqlite"):
+            options["connect_args"] = {"check_same_thread": False}
+    return options
+
+
+def _enable_sqlite_wal(dbapi_connection, connection_record) -> None:
+    """Switches a new SQLite connection to write-ahead logging, which
+    lets readers proceed while a writer commits.
+    """
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.close()
+
+
+def ensure_indexes(engine) -> None:
+    """Creates the indexes of the `users` table that are missing, so a
+    database created before they were declared gains them in place,
+    without dropping its data. Fails if existing rows break a unique
+    index, e.g. two users sharing an email.
+    """
+    for index in User.__table__.indexes:
+        index.create(bind=engine, checkfirst=True)
+
+
+def _create_indexes(engine) -> None:
+    """Migration 1: indexes on email, session_id and reset_token.
+    """
+    ensure_indexes(engine)
+
+
+MIGRATIONS = [
+    _create_indexes,
+]
+SCHEMA_VERSION = len(MIGRATIONS)
+
+_schema_metadata = MetaData()
+_schema_version = Table(
+    "schema_version",
+    _schema_metadata,
+    Column("version", Integer, nullable=False),
+)
+
+
+def bootstrap_schema(engine) -> int:
+    """Brings the database schema up to SCHEMA_VERSION and returns it.
+
+    A new database gets every table at once. An existing one keeps its
+    data and only runs the migrations newer than the version recorded
+    in `schema_version`; a `users` table predating that record counts
+    as version 0. MIGRATIONS[i] upgrades a schema from version i.
+    """
+    _schema_metadata.create_all(engine)
+    with engine.begin() as conn:
+        version = conn.execute(select([_schema_version.c.version])).scalar()
+        if version is None:
+            version = 0
+            if User.__tablename__ not in inspect(conn).get_table_names():
+                Base.metadata.create_all(conn)
+                version = SCHEMA_VERSION
+            conn.execute(_schema_version.insert(), {"version": version})
+    for migration in MIGRATIONS[version:]:
+        with engine.begin() as conn:
+            migration(conn)
+            version += 1
+            conn.execute(_schema_version.update(), {"version": version})
+    return version
+
+
 class DB:
     """DB class.
     """
 
     def __init__(self) -> None:
         """Initialize a new DB instance.
+
+        The database URL is read from DATABASE_URL (default:
+        sqlite:///a.db) and its schema is created or migrated in place.
         """
-        self._engine = create_engine("sqlite:///a.db", echo=False)
-        Base.metadata.drop_all(self._engine)
-        Base.metadata.create_all(self._engine)
-        self.__session = None
+        url = os.getenv("DATABASE_URL", "sqlite:///a.db")
+        self._engine = create_engine(url, echo=False, **_engine_options(url))
+        if url.startswith("sqlite") and os.getenv("DB_SQLITE_WAL") == "1":
+            event.listen(self._engine, "connect", _enable_sqlite_wal)
+        bootstrap_schema(self._engine)
+        self.__session = scoped_session(sessionmaker(bind=self._engine))
 
     @property
     def _session(self) -> Session:
-        """Memoized session object.
+        """Session object of the current thread.
         """
-        if self.__session is None:
-            DBSession = sessionmaker(bind=self._engine)
-            self.__session = DBSession()
-        return self.__session
+        return self.__session()
+
+    def remove_session(self) -> None:
+        """Closes the session of the current thread, returning its
+        connection to the pool.
+        """
+        self.__session.remove()
 
     def add_user(self, email: str, hashed_password: str) -> User:
         """Adds a new user to the database.
@@ -64,17 +167,32 @@ class DB:
     def update_user(self, user_id: int, **kwargs) -> None:
         """Updates a user based on a given id.
         """
-        user = self.find_user_by(id=user_id)
-        if user is None:
-            return
+        if self.update_user_by(kwargs, id=user_id) == 0:
+            raise NoResultFound()
+
+    def update_user_by(self, values: dict, **filters) -> int:
+        """Updates the users matching a set of filters in a single
+        statement and returns the number of updated rows.
+        """
         update_source = {}
-        for key, value in kwargs.items():
-            if hasattr(User, key):
-                update_source[getattr(User, key)] = value
-            else:
+        for key, value in values.items():
+            if key not in USER_COLUMNS:
                 raise ValueError()
-        self._session.query(User).filter(User.id == user_id).update(
-            update_source,
-            synchronize_session=False,
-        )
-        self._session.commit()
+            update_source[USER_COLUMNS[key]] = value
+        criteria = []
+        for key, value in filters.items():
+            if key not in USER_COLUMNS:
+                raise InvalidRequestError()
+            criteria.append(USER_COLUMNS[key] == value)
+        if not update_source:
+            return self._session.query(User).filter(*criteria).count()
+        try:
+            count = self._session.query(User).filter(*criteria).update(
+                update_source,
+                synchronize_session=False,
+            )
+            self._session.commit()
+        except Exception:
+            self._session.rollback()
+            raise
+        return count
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""A module caching the users behind session IDs in memory.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from typing import Union
+
+
+UserSnapshot = namedtuple("UserSnapshot", ["id", "email"])
+
+
+class SessionCache:
+    """Bounded LRU cache from session IDs to user snapshots.
+
+    Entries expire `ttl` seconds after being stored, which bounds how
+    long a change made by another process can go unnoticed. Changes
+    made through `Auth` invalidate the affected entries right away,
+    through the reverse maps kept by user id and by email.
+
+    Every invalidation bumps a generation counter: a lookup takes the
+    generation before reading the database, and `put` skips storing
+    its result if an invalidation ran meanwhile, which could otherwise
+    cache a session destroyed during the read.
+    """
+
+    def __init__(self, max_size: int = 1024, ttl: float = 60.0) -> None:
+        """Initializes a new SessionCache instance.
+        """
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._generation = 0
+        self._entries = OrderedDict()
+        self._by_user_id = {}
+        self._by_email = {}
+        self._lock = threading.Lock()
+
+    def get(self, session_id: str) -> Union[UserSnapshot, None]:
+        """Returns the snapshot cached for a session ID, if fresh.
+        """
+        with self._lock:
+            entry = self._entries.get(session_id)
+            if entry is not None and entry[1] <= time.monotonic():
+                self._discard(session_id)
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(session_id)
+            self.hits += 1
+            return entry[0]
+
+    def generation(self) -> int:
+        """Returns the number of invalidations so far, to pass to `put`.
+        """
+        with self._lock:
+            return self._generation
+
+    def put(self, session_id: str, user,
+            generation: int = None) -> UserSnapshot:
+        """Caches a snapshot of the user owning a session ID, unless an
+        invalidation ran since `generation` was taken.
+        """
+        snapshot = UserSnapshot(user.id, user.email)
+        if self.max_size <= 0:
+            return snapshot
+        with self._lock:
+            if generation is not None and generation != self._generation:
+                return snapshot
+            self._discard(session_id)
+            self._entries[session_id] = (
+                snapshot, time.monotonic() + self.ttl)
+            self._by_user_id[snapshot.id] = session_id
+            self._by_email[snapshot.email] = session_id
+            while len(self._entries) > self.max_size:
+                self._discard(next(iter(self._entries)))
+        return snapshot
+
+    def invalidate_user(self, user_id: int) -> None:
+        """Drops the entry of a user, by id.
+        """
+        with self._lock:
+            self._generation += 1
+            session_id = self._by_user_id.get(user_id)
+            if session_id is not None:
+                self._discard(session_id)
+
+    def invalidate_email(self, email: str) -> None:
+        """Drops the entry of a user, by email.
+        """
+        with self._lock:
+            self._generation += 1
+            session_id = self._by_email.get(email)
+            if session_id is not None:
+                self._discard(session_id)
+
+    def clear(self) -> None:
+        """Drops every entry.
+        """
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+            self._by_user_id.clear()
+            self._by_email.clear()
+
+    def stats(self) -> dict:
+        """Returns the cache size and hit/miss counters.
+        """
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+    def _discard(self, session_id: str) -> None:
+        """Drops an entry and its reverse mappings; lock must be held.
+        """
+        entry = self._entries.pop(session_id, None)
+        if entry is None:
+            return
+        snapshot = entry[0]
+        if self._by_user_id.get(snapshot.id) == session_id:
+            del self._by_user_id[snapshot.id]
+        if self._by_email.get(snapshot.email) == session_id:
+            del self._by_email[snapshot.email]
+
+
+def session_cache_from_env() -> SessionCache:
+    """Returns a cache sized by SESSION_CACHE_SIZE (default: 1024,
+    0 disables it), whose entries live SESSION_CACHE_TTL seconds
+    (default: 60).
+    """
+    return SessionCache(
+        max_size=int(os.getenv("SESSION_CACHE_SIZE", "1024")),
+        ttl=float(os.getenv("SESSION_CACHE_TTL", "60")),
+    )